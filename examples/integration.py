@@ -1,39 +1,34 @@
 """
 集成测试，测试优化后的框架
 """
-import os
-import sys
-from pathlib import Path
 from llm_hub import MultiLLMHub
 
-# 添加项目根目录到模块搜索路径
-# sys.path.append(str(Path(__file__).parent.parent))
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 import minireact as mr
 from  minireact.predict import prediction_cache
 
+# 定义计算工具
+# 工具定义在模块级别，只创建一次；LLM给出的参数可能是字符串形式的数字，统一转换为float
+def add(a: float, b: float) -> float:
+    """将两个数相加"""
+    return float(a) + float(b)
+
+def subtract(a: float, b: float) -> float:
+    """从第一个数中减去第二个数"""
+    return float(a) - float(b)
+
+def multiply(a: float, b: float) -> float:
+    """将两个数相乘"""
+    return float(a) * float(b)
+
+def divide(a: float, b: float) -> float:
+    """将第一个数除以第二个数"""
+    if float(b) == 0:
+        return "错误：除数不能为零"
+    return float(a) / float(b)
+
+
 def test_calculator_agent():
     """测试计算器智能体"""
-    # 定义计算工具
-    def add(a: float, b: float) -> float:
-        """将两个数相加"""
-        return a + b
-    
-    def subtract(a: float, b: float) -> float:
-        """从第一个数中减去第二个数"""
-        return a - b
-    
-    def multiply(a: float, b: float) -> float:
-        """将两个数相乘"""
-        return a * b
-    
-    def divide(a: float, b: float) -> float:
-        """将第一个数除以第二个数"""
-        if b == 0:
-            return "错误：除数不能为零"
-        return a / b
-    
     # 定义任务签名
     calculator_signature = mr.Signature(
         {"expression": mr.InputField(desc="要计算的数学表达式")},
@@ -43,7 +38,9 @@ def test_calculator_agent():
     
     # 创建工具列表
     tools = [add, subtract, multiply, divide]
-    lm = MultiLLMHub().setup_azure_openai()
+    hub = MultiLLMHub()
+    hub.setup_azure_openai()
+    lm = hub["azure"]
     # 创建ReAct智能体（中文模式）
     agent = mr.ReAct(
         signature=calculator_signature, 
@@ -52,9 +49,13 @@ def test_calculator_agent():
         lm=lm
     )
     
+    # 三个表达式相互独立，并发执行
+    expressions = ["3 + 9 * 2 - 4", "6+3*(2/1+1)", "(10 + 2) * 3 / 2 - 5"]
+    results = agent.batch([{"expression": expr} for expr in expressions])
+    
     # 测试简单表达式
-    result = agent(expression="3 + 9 * 2 - 4")
-    print(f"表达式: 3 + 9 * 2 - 4")
+    result = results[0]
+    print(f"表达式: {expressions[0]}")
     print(f"结果: {result.result}")
     print(f"解释: {result.explanation}")
     print("\n轨迹详情:")
@@ -68,17 +69,14 @@ def test_calculator_agent():
             print(f"观察: {result.trajectory.get(f'observation_{idx}', '')}")
     
     # 测试复杂表达式
-    result = agent(expression="6+3*(2/1+1)")
-    print(f"\n表达式: 6+3*(2/1+1)")
-    print(f"结果: {result.result}")
-    print(f"解释: {result.explanation}")
-    print("*"*30)
-    result = agent(expression="(10 + 2) * 3 / 2 - 5")
-    print(f"\n表达式: (10 + 2) * 3 / 2 - 5")
-    print(f"结果: {result.result}")
-    print(f"解释: {result.explanation}")
+    for expr, result in zip(expressions[1:], results[1:]):
+        print(f"\n表达式: {expr}")
+        print(f"结果: {result.result}")
+        print(f"解释: {result.explanation}")
+        print("*"*30)
     
 
+
 if __name__ == "__main__":
     # 启用调试模式
     # mr.enable_debug()
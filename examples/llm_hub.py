@@ -1,19 +1,211 @@
 """
 综合测试多种LLM的类，包括Azure OpenAI、本地Ollama和OpenRouter等
 """
+import asyncio
+import hashlib
 import os
-import sys
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
 from loguru import logger
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional, Tuple
 import dotenv
 dotenv.load_dotenv(override=True)
 
-# 添加上级目录到模块搜索路径，以便导入minireact
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 # 导入minireact
 import minireact as mr
 
+
+@dataclass(frozen=True, slots=True)
+class ProviderSpec:
+    """
+    LLM提供商的描述：从哪些环境变量读取配置，以及缺省值
+    
+    每项环境变量按顺序查找，第一个非空的值生效。
+    """
+    label: str                   # 日志中显示的提供商名称
+    key_envs: Tuple[str, ...]    # API密钥的环境变量，为空表示不需要密钥
+    base_envs: Tuple[str, ...]   # API基础URL的环境变量
+    model_envs: Tuple[str, ...]  # 模型名称的环境变量
+    default_base: Optional[str]
+    default_model: str
+
+
+# 内置提供商，setup_*方法都由这张表驱动
+PROVIDERS: Dict[str, ProviderSpec] = {
+    "openrouter": ProviderSpec(
+        "OpenRouter",
+        ("OPENROUTER_API_KEY", "OPENROUTE_API_KEY"),
+        ("OPENROUTER_BASE_URL", "OPENROUTE_BASE_URL"),
+        ("OPENROUTER_MODEL_NAME", "OPENROUTE_MODEL_NAME"),
+        "https://openrouter.ai/api/v1/",
+        "qwen/qwq-32b-preview",
+    ),
+    "openai": ProviderSpec(
+        "OpenAI",
+        ("OPENAI_API_KEY",),
+        ("OPENAI_BASE_URL",),
+        ("OPENAI_MODEL_NAME",),
+        "https://api.openai.com/v1/",
+        "gpt-3.5-turbo",
+    ),
+    "dashscope": ProviderSpec(
+        "阿里云DashScope",
+        ("DASHSCOPE_API_KEY", "ALI_API_KEY"),
+        ("DASHSCOPE_BASE_URL", "ALI_BASE_URL"),
+        ("DASHSCOPE_MODEL_NAME", "ALI_MODEL_NAME"),
+        "https://dashscope.aliyuncs.com/compatible-mode/v1/",
+        "qwen-turbo",
+    ),
+    "azure": ProviderSpec(
+        "Azure OpenAI",
+        ("AZURE_OPENAI_API_KEY",),
+        ("AZURE_OPENAI_ENDPOINT",),
+        ("AZURE_MODEL_NAME",),
+        None,
+        "gpt-4o",
+    ),
+    "ollama": ProviderSpec(
+        "Ollama",
+        (),
+        (),
+        ("OLLAMA_MODEL_NAME",),
+        "http://localhost:11434",
+        "qwen3:8b",
+    ),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class ProviderSettings:
+    """单个提供商从环境变量解析出的配置"""
+    api_key: Optional[str]
+    api_base: Optional[str]
+    model: str
+
+
+@dataclass(frozen=True, slots=True)
+class ProviderConfig:
+    """
+    各LLM提供商的环境变量配置
+    
+    在模块导入时从环境变量解析一次，之后各setup_*方法直接读取，不再重复查询环境变量。
+    """
+    providers: Dict[str, ProviderSettings]
+    
+    def __getitem__(self, provider: str) -> ProviderSettings:
+        return self.providers[provider]
+    
+    @classmethod
+    def from_env(cls, env: Optional[Dict[str, str]] = None) -> "ProviderConfig":
+        """
+        从环境变量创建配置
+        
+        参数:
+            env: 环境变量字典，默认为os.environ
+            
+        返回:
+            ProviderConfig实例
+        """
+        env = os.environ if env is None else env
+        
+        def first(names: Tuple[str, ...], default: Optional[str] = None) -> Optional[str]:
+            for name in names:
+                value = env.get(name)
+                if value:
+                    return value
+            return default
+        
+        return cls({
+            name: ProviderSettings(
+                api_key=first(spec.key_envs),
+                api_base=first(spec.base_envs, spec.default_base),
+                model=first(spec.model_envs, spec.default_model),
+            )
+            for name, spec in PROVIDERS.items()
+        })
+
+
+# 全局提供商配置，在加载.env之后解析
+CFG = ProviderConfig.from_env()
+
+
+# 提示中包含时间信息时结果随时间变化，不应复用缓存
+_TIMESTAMP_RE = re.compile(r"\d{4}[-/]\d{1,2}[-/]\d{1,2}|\d{1,2}:\d{2}|今天|现在|当前时间")
+
+
+class _SemanticCache:
+    """
+    LLM响应缓存，用于在多次测试中复用相同提示的回复
+    
+    缓存键由模型、API基址、调用方法、规范化后提示的摘要和四舍五入后的温度组成。
+    温度较高时输出本身具有随机性，此时不使用缓存。
+    """
+    
+    def __init__(self, maxsize: int = 256, max_temperature: float = 0.3):
+        """
+        初始化缓存
+        
+        参数:
+            maxsize: 最大缓存条目数
+            max_temperature: 允许使用缓存的最高温度
+        """
+        self.maxsize = maxsize
+        self.max_temperature = max_temperature
+        self._data: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def make_key(self, lm: mr.LM, method: str, prompt: Any, temperature: float) -> Optional[Tuple]:
+        """
+        生成缓存键
+        
+        参数:
+            lm: LM实例
+            method: 调用的方法名，如'complete'或'chat'
+            prompt: 提示字符串或消息列表
+            temperature: 温度参数
+            
+        返回:
+            缓存键；当不应使用缓存时返回None
+        """
+        if temperature > self.max_temperature:
+            return None
+        
+        if isinstance(prompt, str):
+            normalized = prompt.strip().lower()
+        else:
+            normalized = tuple((m.get("role", ""), str(m.get("content", "")).strip().lower()) for m in prompt)
+        
+        normalized = str(normalized)
+        if _TIMESTAMP_RE.search(normalized):
+            return None
+        
+        # 键中只保存提示的16字节摘要，而不是完整的提示文本，降低缓存占用的内存
+        digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+        return (lm.model_name, lm.api_base, method, digest, round(temperature, 2))
+    
+    def get(self, key: Optional[Tuple]) -> Any:
+        """获取缓存项，未命中时返回None"""
+        if key is None:
+            return None
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: Optional[Tuple], value: Any):
+        """设置缓存项，超出容量时淘汰最久未使用的条目"""
+        if key is None:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
 class MultiLLMHub:
     """
     综合测试多种LLM的类
@@ -27,133 +219,134 @@ class MultiLLMHub:
         参数:
             debug: 是否启用调试模式
         """
-        self.lm_instances = {}  # 存储不同的LM实例
+        self._lm_factories: Dict[str, Callable[[], mr.LM]] = {}  # 各提供商LM实例的构造函数
+        self._lm_cache: Dict[str, mr.LM] = {}  # 已构造的LM实例
+        self._cache = _SemanticCache()  # 测试响应缓存
         
         # 启用调试模式
         if debug:
             mr.enable_debug()
             logger.info("已启用调试模式")
     
-    def setup_openrouter(self, 
-                        api_key: str = None, 
-                        model: str = None,
-                        api_base: str = None) -> mr.LM:
+    @property
+    def lm_instances(self) -> Dict[str, mr.LM]:
+        """所有已设置的LM实例，尚未构造的实例会在访问时构造"""
+        return {llm_type: self.get(llm_type) for llm_type in self._lm_factories}
+    
+    def _register(self, llm_type: str, factory: Callable[[], mr.LM]):
         """
-        设置OpenRouter LLM
+        注册LM实例的构造函数，实例在第一次使用时才会创建
         
         参数:
-            api_key: OpenRouter API密钥
-            model: 要使用的模型
-            api_base: API基础URL
+            llm_type: LLM类型
+            factory: 无参数的构造函数，返回LM实例
+        """
+        self._lm_factories[llm_type] = factory
+        self._lm_cache.pop(llm_type, None)
+    
+    def get(self, llm_type: str) -> mr.LM:
+        """
+        获取指定类型的LM实例，第一次获取时构造并缓存
+        
+        参数:
+            llm_type: LLM类型
             
         返回:
             LM实例
         """
-        if not api_key:
-            api_key = os.environ.get("OPENROUTER_API_KEY") or os.environ.get("OPENROUTE_API_KEY")
+        lm = self._lm_cache.get(llm_type)
+        if lm is None:
+            lm = self._lm_factories[llm_type]()
+            self._lm_cache[llm_type] = lm
+        return lm
+    
+    def __getitem__(self, llm_type: str) -> mr.LM:
+        return self.get(llm_type)
+    
+    def _setup(self,
+               provider: str,
+               api_key: Optional[str] = None,
+               model: Optional[str] = None,
+               api_base: Optional[str] = None):
+        """
+        按PROVIDERS表注册一个内置提供商的LLM，未提供的参数从环境变量配置中补全
+        
+        只登记构造参数，LM实例在第一次通过hub[provider]或get获取时才创建
+        
+        参数:
+            provider: 提供商名称，PROVIDERS中的键
+            api_key: API密钥
+            model: 要使用的模型
+            api_base: API基础URL
+        """
+        spec = PROVIDERS[provider]
+        settings = CFG[provider]
+        
+        if not spec.key_envs:
+            api_key = ""  # 本地服务通常不需要API密钥
+        elif not api_key:
+            api_key = settings.api_key
             if not api_key:
-                logger.warning("未提供OpenRouter API密钥，也未在环境变量中找到")
+                logger.warning(f"未提供{spec.label} API密钥，也未在环境变量中找到")
         if not api_base:
-            api_base = os.environ.get("OPENROUTER_BASE_URL") or os.environ.get("OPENROUTE_BASE_URL", "https://openrouter.ai/api/v1/")
+            api_base = settings.api_base
         if not model:
-            model = os.environ.get("OPENROUTER_MODEL_NAME") or os.environ.get("OPENROUTE_MODEL_NAME", "qwen/qwq-32b-preview")
-
-        logger.info(f"设置OpenRouter LLM，模型: {model}")
+            model = settings.model
         
-        # 直接使用模型名称，不添加前缀
-        lm = mr.LM(
-            model,
-            api_base=api_base,
-            api_key=api_key
-        )
+        logger.info(f"设置{spec.label} LLM，模型: {model}")
         
-        # 存储实例
-        self.lm_instances["openrouter"] = lm
-        return lm
+        # 兼容OpenAI协议，直接使用模型名称；注册构造函数，实例在第一次使用时创建
+        self._register(provider, lambda: mr.LM(model, api_base=api_base, api_key=api_key))
+    
+    def setup_openrouter(self, 
+                        api_key: str = None, 
+                        model: str = None,
+                        api_base: str = None):
+        """
+        注册OpenRouter LLM，之后通过hub["openrouter"]获取LM实例
+        
+        参数:
+            api_key: OpenRouter API密钥
+            model: 要使用的模型
+            api_base: API基础URL
+        """
+        self._setup("openrouter", api_key=api_key, model=model, api_base=api_base)
     
     def setup_openai(self, 
                     api_key: Optional[str] = None, 
                     model: str = None,
-                    api_base: Optional[str] = None) -> mr.LM:
+                    api_base: Optional[str] = None):
         """
-        设置OpenAI LLM
+        注册OpenAI LLM，之后通过hub["openai"]获取LM实例
         
         参数:
             api_key: OpenAI API密钥，如果为None则尝试从环境变量获取
             model: 要使用的模型
             api_base: API基础URL，如果为None则使用默认值
-            
-        返回:
-            LM实例
         """
-        # 如果未提供API密钥，尝试从环境变量获取
-        if api_key is None:
-            api_key = os.environ.get("OPENAI_API_KEY")
-            if not api_key:
-                logger.warning("未提供OpenAI API密钥，也未在环境变量中找到")
-        if not api_base:
-            api_base = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1/")
-        if not model:
-            model = os.environ.get("OPENAI_MODEL_NAME", "gpt-3.5-turbo")
-        
-        logger.info(f"设置OpenAI LLM，模型: {model}")
-        
-        # 直接使用模型名称，标准OpenAI协议不需要前缀
-        lm = mr.LM(
-            model,
-            api_base=api_base,
-            api_key=api_key
-        )
-        
-        # 存储实例
-        self.lm_instances["openai"] = lm
-        return lm
+        self._setup("openai", api_key=api_key, model=model, api_base=api_base)
     
     def setup_dashscope(self, 
                     api_key: Optional[str] = None, 
                     model: str = None,
-                    api_base: Optional[str] = None) -> mr.LM:
+                    api_base: Optional[str] = None):
         """
-        设置阿里云DashScope LLM（兼容OpenAI协议）
+        注册阿里云DashScope LLM（兼容OpenAI协议），之后通过hub["dashscope"]获取LM实例
         
         参数:
             api_key: DashScope API密钥，如果为None则尝试从环境变量获取
             model: 要使用的模型
             api_base: API基础URL，如果为None则使用默认值
-            
-        返回:
-            LM实例
         """
-        # 如果未提供API密钥，尝试从环境变量获取
-        if api_key is None:
-            api_key = os.environ.get("DASHSCOPE_API_KEY") or os.environ.get("ALI_API_KEY")
-            if not api_key:
-                logger.warning("未提供DashScope API密钥，也未在环境变量中找到")
-        if not api_base:
-            api_base = os.environ.get("DASHSCOPE_BASE_URL") or os.environ.get("ALI_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1/")
-        if not model:
-            model = os.environ.get("DASHSCOPE_MODEL_NAME") or os.environ.get("ALI_MODEL_NAME", "qwen-turbo")
-        
-        logger.info(f"设置阿里云DashScope LLM，模型: {model}")
-        
-        # 直接使用模型名称，不添加前缀
-        lm = mr.LM(
-            model,
-            api_base=api_base,
-            api_key=api_key
-        )
-        
-        # 存储实例
-        self.lm_instances["dashscope"] = lm
-        return lm
+        self._setup("dashscope", api_key=api_key, model=model, api_base=api_base)
     
     def setup_azure_openai(self, 
                           api_key: str = None, 
                           api_base: str = None,
                           deployment_name: str = "gpt-4o",
-                          api_version: str = "2024-05-01-preview") -> mr.LM:
+                          api_version: str = "2024-05-01-preview"):
         """
-        设置Azure OpenAI LLM
+        注册Azure OpenAI LLM，之后通过hub["azure"]获取LM实例
         
         注意：Azure OpenAI 使用不同的API格式，需要特殊处理
         
@@ -162,20 +355,18 @@ class MultiLLMHub:
             api_base: Azure OpenAI资源端点（如：https://your-resource.openai.azure.com）
             deployment_name: Azure部署名称
             api_version: API版本
-            
-        返回:
-            LM实例
         """
+        settings = CFG["azure"]
         if not api_key:
-            api_key = os.environ.get("AZURE_OPENAI_API_KEY")
+            api_key = settings.api_key
             if not api_key:
                 logger.warning("未提供Azure OpenAI API密钥，也未在环境变量中找到")
         if not api_base:
-            api_base = os.environ.get("AZURE_OPENAI_ENDPOINT")
+            api_base = settings.api_base
             if not api_base:
                 logger.warning("未提供Azure OpenAI API基础URL，也未在环境变量中找到")
         if not deployment_name:
-            deployment_name = os.environ.get("AZURE_MODEL_NAME", "gpt-4o")
+            deployment_name = settings.model
 
         # 构建正确的Azure OpenAI API端点
         # Azure格式: https://{resource}.openai.azure.com/openai/deployments/{deployment}/chat/completions?api-version={version}
@@ -187,80 +378,112 @@ class MultiLLMHub:
         logger.info(f"设置Azure OpenAI LLM，部署: {deployment_name}")
         logger.info(f"Azure API端点: {azure_api_base}")
         
-        # 对于Azure，我们直接使用deployment_name作为模型名
-        lm = mr.LM(
+        # 对于Azure，我们直接使用deployment_name作为模型名；注册构造函数，实例在第一次使用时创建
+        self._register("azure", lambda: mr.LM(
             deployment_name,
             api_base=azure_api_base,
             api_key=api_key,
             api_version=api_version
-        )
-        
-        # 存储实例
-        self.lm_instances["azure"] = lm
-        return lm
+        ))
     
     def setup_ollama(self, 
                     model: str = None, 
-                    api_base: str = "http://localhost:11434") -> mr.LM:
+                    api_base: str = "http://localhost:11434"):
         """
-        设置Ollama本地LLM
+        注册Ollama本地LLM，之后通过hub["ollama"]获取LM实例
         
         参数:
             model: 要使用的Ollama模型
             api_base: Ollama API基础URL
-            
-        返回:
-            LM实例
         """
-        if not model:
-            model = os.environ.get("OLLAMA_MODEL_NAME", "qwen3:8b")
-
-        logger.info(f"设置Ollama LLM，模型: {model}")
-        
-        try:
-            # Ollama兼容OpenAI协议，直接使用模型名称
-            lm = mr.LM(
-                model,
-                api_base=api_base,
-                api_key=""  # Ollama通常不需要API密钥
-            )
-            
-            # 存储实例
-            self.lm_instances["ollama"] = lm
-            return lm
-        except Exception as e:
-            logger.error(f"设置Ollama出错: {e}")
-            logger.info("要使用Ollama，请先安装并运行Ollama服务")
-            return None
+        self._setup("ollama", model=model, api_base=api_base)
     
     def setup_custom_openai_compatible(self,
                                      provider_name: str,
                                      api_key: str,
                                      api_base: str,
-                                     model: str) -> mr.LM:
+                                     model: str):
         """
-        设置自定义的兼容OpenAI协议的LLM提供商
+        注册自定义的兼容OpenAI协议的LLM提供商，之后通过hub[provider_name.lower()]获取LM实例
         
         参数:
             provider_name: 提供商名称（用于标识）
             api_key: API密钥
             api_base: API基础URL
             model: 模型名称
-            
-        返回:
-            LM实例
         """
         logger.info(f"设置自定义OpenAI兼容提供商: {provider_name}，模型: {model}")
         
-        lm = mr.LM(
+        # 注册构造函数，实例在第一次使用时创建
+        self._register(provider_name.lower(), lambda: mr.LM(
             model,
             api_base=api_base,
             api_key=api_key
-        )
+        ))
+    
+    def _cached_complete(self, lm: mr.LM, prompt: str, temperature: float) -> str:
+        """调用LM的complete方法，优先使用缓存的回复"""
+        cache_key = self._cache.make_key(lm, "complete", prompt, temperature)
+        response = self._cache.get(cache_key)
+        if response is not None:
+            logger.info("使用缓存的complete回复")
+            return response
+        
+        response = lm.complete(prompt, temperature=temperature)
+        if not response.startswith("调用语言模型时出错"):
+            self._cache.set(cache_key, response)
+        return response
+    
+    def _cached_chat(self, lm: mr.LM, messages: list, temperature: float) -> Dict[str, Any]:
+        """调用LM的chat方法，优先使用缓存的回复"""
+        cache_key = self._cache.make_key(lm, "chat", messages, temperature)
+        response = self._cache.get(cache_key)
+        if response is not None:
+            logger.info("使用缓存的chat回复")
+            return response
+        
+        response = lm.chat(messages, temperature=temperature)
+        # 调用出错时不缓存，以便下次重新请求
+        if "error" not in response:
+            self._cache.set(cache_key, response)
+        return response
+    
+    def _stream_and_print(self, lm: mr.LM, method: str, prompt: Any, temperature: float) -> str:
+        """
+        以流式方式调用LM并在收到内容时立即打印，优先使用缓存的回复
         
-        # 存储实例
-        self.lm_instances[provider_name.lower()] = lm
-        return lm
+        参数:
+            lm: LM实例
+            method: 调用的方法名，'complete'或'chat'
+            prompt: 提示字符串或消息列表
+            temperature: 温度参数
+            
+        返回:
+            完整的回复文本
+        """
+        cache_key = self._cache.make_key(lm, f"{method}_stream", prompt, temperature)
+        text = self._cache.get(cache_key)
+        if text is not None:
+            logger.info(f"使用缓存的{method}回复")
+            print(text, flush=True)
+            return text
+        
+        if method == "complete":
+            chunks = lm.complete(prompt, temperature=temperature, stream=True)
+        else:
+            chunks = lm.chat(prompt, temperature=temperature, stream=True)
+        
+        parts = []
+        for chunk in chunks:
+            print(chunk, end="", flush=True)
+            parts.append(chunk)
+        print()
+        
+        text = "".join(parts)
+        # 调用出错时不缓存，以便下次重新请求
+        if "调用语言模型时出错" not in text:
+            self._cache.set(cache_key, text)
+        return text
     
     def check_llm(self, 
                 llm_type: str, 
@@ -281,19 +504,23 @@ class MultiLLMHub:
         """
         results = {}
         
-        if llm_type not in self.lm_instances:
+        if llm_type not in self._lm_factories:
             logger.error(f"未找到类型为 {llm_type} 的LLM实例，请先设置")
             return {"error": f"未找到类型为 {llm_type} 的LLM实例"}
         
-        lm = self.lm_instances[llm_type]
+        try:
+            lm = self.get(llm_type)
+        except Exception as e:
+            logger.error(f"创建{llm_type}的LLM实例出错: {e}")
+            return {"error": f"创建LLM实例出错: {e}"}
         
         # 测试complete方法
         print(f"\n=== 测试 {llm_type} 的complete方法 ===")
         print(f"发送提示: {prompt}")
         
         try:
-            response = lm.complete(prompt, temperature=temperature)
-            print("\n收到回复:\n", response)
+            print("\n收到回复:")
+            response = self._stream_and_print(lm, "complete", prompt, temperature)
             results["complete"] = response
         except Exception as e:
             error_msg = f"complete方法出错: {e}"
@@ -309,9 +536,9 @@ class MultiLLMHub:
         print(f"发送消息: {chat_message}")
         
         try:
-            response = lm.chat(messages, temperature=temperature)
-            print("\n收到回复:", response["content"])
-            results["chat"] = response
+            print("\n收到回复:")
+            content = self._stream_and_print(lm, "chat", messages, temperature)
+            results["chat"] = {"content": content, "model": lm.model_name}
         except Exception as e:
             error_msg = f"chat方法出错: {e}"
             print(f"\n{error_msg}")
@@ -319,12 +546,75 @@ class MultiLLMHub:
         
         return results
     
-    def check_all(self, 
+    async def check_llm_async(self, 
+                llm_type: str, 
+                prompt: str = "请用中文写一首关于人工智能的短诗", 
+                chat_message: str = "你好，请简单介绍一下自己",
+                temperature: float = 0.7) -> Dict[str, Any]:
+        """
+        异步测试指定类型的LLM
+        
+        complete和chat调用在线程中并发执行，结果在两者都完成后统一输出，
+        避免多个提供商同时测试时输出交错。
+        
+        参数:
+            llm_type: LLM类型，如'openrouter', 'openai', 'azure', 'ollama', 'dashscope'
+            prompt: 用于complete方法的提示
+            chat_message: 用于chat方法的消息
+            temperature: 温度参数
+            
+        返回:
+            测试结果字典
+        """
+        if llm_type not in self._lm_factories:
+            logger.error(f"未找到类型为 {llm_type} 的LLM实例，请先设置")
+            return {"error": f"未找到类型为 {llm_type} 的LLM实例"}
+        
+        try:
+            lm = self.get(llm_type)
+        except Exception as e:
+            logger.error(f"创建{llm_type}的LLM实例出错: {e}")
+            return {"error": f"创建LLM实例出错: {e}"}
+        messages = [
+            {"role": "user", "content": chat_message}
+        ]
+        
+        complete_result, chat_result = await asyncio.gather(
+            asyncio.to_thread(self._cached_complete, lm, prompt, temperature),
+            asyncio.to_thread(self._cached_chat, lm, messages, temperature),
+            return_exceptions=True
+        )
+        
+        results = {}
+        lines = [f"\n\n{'='*50}", f"测试 {llm_type} LLM", f"{'='*50}"]
+        
+        lines.append(f"\n=== 测试 {llm_type} 的complete方法 ===")
+        lines.append(f"发送提示: {prompt}")
+        if isinstance(complete_result, Exception):
+            results["complete_error"] = f"complete方法出错: {complete_result}"
+            lines.append(f"\n{results['complete_error']}")
+        else:
+            results["complete"] = complete_result
+            lines.append(f"\n收到回复:\n {complete_result}")
+        
+        lines.append(f"\n=== 测试 {llm_type} 的chat方法 ===")
+        lines.append(f"发送消息: {chat_message}")
+        if isinstance(chat_result, Exception):
+            results["chat_error"] = f"chat方法出错: {chat_result}"
+            lines.append(f"\n{results['chat_error']}")
+        else:
+            results["chat"] = chat_result
+            lines.append(f"\n收到回复: {chat_result['content']}")
+        
+        print("\n".join(lines))
+        return results
+    
+    async def check_all_async(self, 
                 prompt: str = "请用中文写一首关于人工智能的短诗", 
                 chat_message: str = "你好，请简单介绍一下自己",
                 temperature: float = 0.7) -> Dict[str, Dict[str, Any]]:
         """
-        测试所有已设置的LLM
+        并发测试所有已设置的LLM
         
         参数:
             prompt: 用于complete方法的提示
@@ -334,22 +624,49 @@ class MultiLLMHub:
         返回:
             所有测试结果的字典
         """
-        all_results = {}
-        
-        if not self.lm_instances:
+        if not self._lm_factories:
             logger.warning("没有设置任何LLM实例，请先设置")
             return {"error": "没有设置任何LLM实例"}
         
-        for llm_type in self.lm_instances:
-            print(f"\n\n{'='*50}")
-            print(f"测试 {llm_type} LLM")
-            print(f"{'='*50}")
-            
-            results = self.check_llm(llm_type, prompt, chat_message, temperature)
-            all_results[llm_type] = results
+        llm_types = list(self._lm_factories)
+        tasks = [self.check_llm_async(llm_type, prompt, chat_message, temperature) for llm_type in llm_types]
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        all_results = {}
+        for llm_type, outcome in zip(llm_types, outcomes):
+            if isinstance(outcome, Exception):
+                all_results[llm_type] = {"error": f"测试出错: {outcome}"}
+            else:
+                all_results[llm_type] = outcome
         
         return all_results
     
+    def check_all(self, 
+                prompt: str = "请用中文写一首关于人工智能的短诗", 
+                chat_message: str = "你好，请简单介绍一下自己",
+                temperature: float = 0.7) -> Dict[str, Dict[str, Any]]:
+        """
+        测试所有已设置的LLM
+        
+        各提供商的测试并发执行，总耗时取决于最慢的提供商而不是所有提供商耗时之和。
+        
+        参数:
+            prompt: 用于complete方法的提示
+            chat_message: 用于chat方法的消息
+            temperature: 温度参数
+            
+        返回:
+            所有测试结果的字典
+        """
+        async def run() -> Dict[str, Dict[str, Any]]:
+            try:
+                return await self.check_all_async(prompt, chat_message, temperature)
+            finally:
+                # asyncio.run创建的事件循环随即关闭，先关闭其中的异步HTTP客户端
+                await mr.aclose_http_clients()
+        
+        return asyncio.run(run())
+    
     def list_available_providers(self):
         """列出所有可用的提供商设置方法"""
         providers = {
@@ -1,13 +1,10 @@
 """
 搜索示例程序，展示如何使用minireact框架创建一个搜索和问答智能体
 """
-import os
+import asyncio
 import sys
 import logging
 
-# 添加上级目录到模块搜索路径，以便导入minireact
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 import minireact as mr
 
 # 配置日志
@@ -49,6 +46,31 @@ documents = {
     """
 }
 
+# 文档库是静态的，加载时按列存储标题、小写标题和小写内容，搜索时直接扫描这些列表
+_titles = [sys.intern(title) for title in documents]
+_titles_lower = [title.lower() for title in _titles]
+_contents_lower = [content.lower() for content in documents.values()]
+# 小写标题到原标题的映射，用于read_document的匹配
+_title_lower_to_key = dict(zip(_titles_lower, _titles))
+
+# 字符位图预筛选：为语料中出现的每个字符分配一个比特位，每篇文档用一个整数记录其包含的字符。
+# 查询中只要有一个字符不在某篇文档中，该文档就不可能包含查询子串，可以跳过逐字符的子串匹配。
+_char_bits = {ch: 1 << i for i, ch in enumerate(sorted(set("".join(_titles_lower + _contents_lower))))}
+
+
+def _char_mask(text: str) -> int:
+    """计算文本的字符位图，包含语料中未出现的字符时返回-1"""
+    mask = 0
+    for ch in set(text):
+        bit = _char_bits.get(ch)
+        if bit is None:
+            return -1
+        mask |= bit
+    return mask
+
+
+_doc_masks = [_char_mask(t + c) for t, c in zip(_titles_lower, _contents_lower)]
+
 # 定义搜索工具
 def search(query: str) -> str:
     """
@@ -62,9 +84,17 @@ def search(query: str) -> str:
     """
     # 简单的关键词匹配
     results = []
-    for title, content in documents.items():
-        if query.lower() in title.lower() or query.lower() in content.lower():
-            results.append(f"- {title}: {content[:100]}...")
+    query_lower = query.lower()
+    query_mask = _char_mask(query_lower)
+    if query_mask == -1:
+        return f"没有找到与'{query}'相关的文档。"
+    
+    for i, title_lower in enumerate(_titles_lower):
+        if query_mask & ~_doc_masks[i]:
+            continue
+        if query_lower in title_lower or query_lower in _contents_lower[i]:
+            title = _titles[i]
+            results.append(f"- {title}: {documents[title][:100]}...")
     
     if results:
         return "找到以下相关文档:\n" + "\n".join(results)
@@ -86,9 +116,14 @@ def read_document(title: str) -> str:
     if title in documents:
         return f"文档 '{title}':\n{documents[title]}"
     
+    title_lower = title.lower()
+    doc_title = _title_lower_to_key.get(title_lower)
+    if doc_title is not None:
+        return f"文档 '{doc_title}':\n{documents[doc_title]}"
+    
     # 尝试模糊匹配
-    for doc_title in documents:
-        if title.lower() in doc_title.lower() or doc_title.lower() in title.lower():
+    for doc_title_lower, doc_title in _title_lower_to_key.items():
+        if title_lower in doc_title_lower or doc_title_lower in title_lower:
             return f"找到相似标题文档 '{doc_title}':\n{documents[doc_title]}"
     
     return f"找不到标题为'{title}'的文档。"
@@ -100,11 +135,13 @@ qa_signature = mr.Signature(
     instructions="你是一个问答智能体，能够回答用户关于人工智能的问题。使用提供的工具搜索相关信息，并给出准确的回答。"
 )
 
-def main():
+async def main():
     # 创建工具列表
     tools = [search, read_document]
     from llm_hub import MultiLLMHub
-    lm = MultiLLMHub().setup_azure_openai()
+    hub = MultiLLMHub()
+    hub.setup_azure_openai()
+    lm = hub["azure"]
     # 创建ReAct智能体
     agent = mr.ReAct(qa_signature, tools,3,lm=lm)
     
@@ -113,14 +150,15 @@ def main():
     print("例如: '什么是深度学习?' 或 '人工智能和机器学习有什么区别?'")
     
     while True:
-        user_input = input("\n问题> ")
+        # 在工作线程中等待用户输入，不阻塞事件循环
+        user_input = await asyncio.to_thread(input, "\n问题> ")
         if user_input.lower() in ('exit', 'quit', 'q'):
             break
         
         # 使用智能体处理问题
         try:
             print("\n正在思考...")
-            result = agent(question=user_input)
+            result = await asyncio.to_thread(agent, question=user_input)
             
             print(f"\n回答: {result.answer}")
             print(f"\n信息来源: {result.sources}")
@@ -146,4 +184,4 @@ if __name__ == "__main__":
     # 如果想查看执行过程中的思考和工具调用
     mr.enable_debug()
     # 启动主程序
-    main() 
\ No newline at end of file
+    asyncio.run(main()) 
\ No newline at end of file
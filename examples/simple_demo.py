@@ -1,17 +1,23 @@
 """
 简单示例程序，展示如何使用minireact框架创建一个计算器智能体
 """
-import os
+import functools
 import sys
 from loguru import logger
 
 from llm_hub import MultiLLMHub
-# 添加上级目录到模块搜索路径，以便导入minireact
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from minireact import ReAct,streamify,Signature,InputField,OutputField,streaming_response
 
 
+@functools.lru_cache(maxsize=1)
+def _lm():
+    """获取共享的LM实例，main、stream_main和test_config_only复用同一个实例及其连接池"""
+    hub = MultiLLMHub()
+    hub.setup_azure_openai()
+    return hub["azure"]
+
+
 # 定义一些计算工具
 def add(a: float, b: float) -> float:
     """将两个数相加"""
@@ -39,10 +45,24 @@ calculator_signature = Signature(
 )
 
 
+def format_trajectory(trajectory: dict) -> str:
+    """将轨迹格式化为便于阅读的文本"""
+    lines = []
+    for key, value in trajectory.items():
+        if key.startswith('thought'):
+            lines.append(f"\n思考: {value}")
+        elif key.startswith('tool_name'):
+            idx = key.split('_')[-1]
+            lines.append(f"工具: {value}")
+            lines.append(f"参数: {trajectory.get(f'tool_args_{idx}', {})}")
+            lines.append(f"观察: {trajectory.get(f'observation_{idx}', '')}")
+    return "\n".join(lines)
+
+
 def main():
     # 创建工具列表
     tools = [add, subtract, multiply, divide]
-    lm = MultiLLMHub().setup_azure_openai()
+    lm = _lm()
     # 创建ReAct智能体
     agent = ReAct(signature=calculator_signature, tools=tools,max_iters=10,lm=lm)
     
@@ -61,37 +81,45 @@ def main():
         logger.info(f"\n结果: {result.result}")
         logger.info(f"解释: {result.explanation}")
         
-        # 可选：打印轨迹信息，用于调试
+        # 可选：打印轨迹信息，用于调试；轨迹只在日志实际输出时才格式化
         if '--debug' in sys.argv:
-            logger.info("\n轨迹详情:")
-            for key, value in result.trajectory.items():
-                if key.startswith('thought'):
-                    logger.info(f"\n思考: {value}")
-                elif key.startswith('tool_name'):
-                    idx = key.split('_')[-1]
-                    logger.info(f"工具: {value}")
-                    logger.info(f"参数: {result.trajectory.get(f'tool_args_{idx}', {})}")
-                    logger.info(f"观察: {result.trajectory.get(f'observation_{idx}', '')}")
+            logger.opt(lazy=True).debug("\n轨迹详情:{}", lambda: format_trajectory(result.trajectory))
             
     except Exception as e:
         logger.error(f"处理表达式时出错: {e}")
 
 
+# 流式输出的分隔线，模块加载时生成一次
+_SEP = "-" * 50 + "\n"
+# 每输出多少个数据块刷新一次标准输出
+_FLUSH_EVERY = 8
+
+
 async def process_stream_to_console(generator):
     """将流式响应输出到控制台"""
+    write = sys.stdout.write
+    count = 0
     async for chunk in generator:
-        if hasattr(chunk, '__str__'):
-            logger.info("-"*50)
-            logger.warning(f"\n{chunk}")
-        else:
-            logger.info("&"*50)
-            logger.warning(f"\n未知数据类型: {type(chunk)}")
+        write(_SEP)
+        write(chunk if isinstance(chunk, str) else str(chunk))
+        write("\n")
+        count += 1
+        if count % _FLUSH_EVERY == 0:
+            sys.stdout.flush()
+    sys.stdout.flush()
 
 async def process_stream_to_api(generator):
     """将流式响应转换为API格式并输出"""
+    write = sys.stdout.write
+    count = 0
     async for chunk in streaming_response(generator):
-        logger.info("-"*50)
-        logger.warning(chunk.strip())
+        write(_SEP)
+        write(chunk.strip())
+        write("\n")
+        count += 1
+        if count % _FLUSH_EVERY == 0:
+            sys.stdout.flush()
+    sys.stdout.flush()
 
 async def stream_main():
     # 启用调试模式
@@ -106,7 +134,7 @@ async def stream_main():
     print(f"全局API基址: {mr.lm_config.get_config('api_base')}")
     
     tools = [add, subtract, multiply, divide]
-    lm = MultiLLMHub().setup_azure_openai()
+    lm = _lm()
     
     print(f"\n创建的LM实例:")
     print(f"  模型: {lm.model_name}")
@@ -132,7 +160,7 @@ async def stream_main():
 def test_config_only():
     """仅测试配置，不进行真实API调用"""
     tools = [add, subtract, multiply, divide]
-    lm = MultiLLMHub().setup_azure_openai()
+    lm = _lm()
     
     print(f"=== 配置验证 ===")
     print(f"选择的LM模型: {lm.model_name}")
@@ -2,11 +2,12 @@
 使用streamify流式返回功能的示例
 """
 
+import ast
 import asyncio
+import functools
 import json
-import os
+import operator
 import sys
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from llm_hub import MultiLLMHub
 from minireact import (
     ReAct, Signature, InputField, OutputField, Tool,
@@ -25,12 +26,53 @@ def search(query: str) -> str:
     else:
         return f"没有找到关于'{query}'的相关信息。"
 
+def _safe_pow(base, exp):
+    """乘方运算，限制指数大小，避免超大整数耗尽CPU和内存"""
+    if abs(exp) > 100:
+        raise ValueError("指数过大")
+    return operator.pow(base, exp)
+
+
+# 计算器允许的运算符和函数
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _safe_pow,
+}
+_UNARY_OPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+_FUNCS = {"abs": abs, "round": round, "max": max, "min": min}
+
+
+def _eval_node(node: ast.AST):
+    """按白名单递归求值表达式的语法树节点"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+        return _BIN_OPS[type(node.op)](_eval_node(node.left), _eval_node(node.right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        return _UNARY_OPS[type(node.op)](_eval_node(node.operand))
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in _FUNCS and not node.keywords):
+        return _FUNCS[node.func.id](*(_eval_node(arg) for arg in node.args))
+    raise ValueError(f"不支持的表达式: {ast.dump(node)}")
+
+
+@functools.lru_cache(maxsize=512)
+def _evaluate(expression: str):
+    """解析并计算表达式，相同的表达式只计算一次"""
+    return _eval_node(ast.parse(expression.strip(), mode="eval").body)
+
+
 # 定义一个计算器工具
 def calculate(expression: str) -> str:
     """执行简单的数学计算"""
     try:
-        # 安全地评估表达式
-        result = eval(expression, {"__builtins__": {}}, {"abs": abs, "round": round, "max": max, "min": min})
+        # 只计算白名单内的运算，不使用eval
+        result = _evaluate(expression)
         return f"计算结果: {expression} = {result}"
     except Exception as e:
         return f"计算错误: {e}"
@@ -49,7 +91,9 @@ signature = (
     )
 )
 
-lm = MultiLLMHub().setup_azure_openai()
+hub = MultiLLMHub()
+hub.setup_azure_openai()
+lm = hub["azure"]
 # 创建ReAct实例
 react = ReAct(
     signature=signature,
@@ -61,18 +105,34 @@ react = ReAct(
 # 使用streamify包装ReAct实例
 stream_react = streamify(react)
 
-async def process_stream_to_console(generator):
-    """将流式响应输出到控制台"""
+async def process_stream_to_console(generator, tag: str = ""):
+    """将流式响应输出到控制台，tag用于区分并发执行的不同问题"""
+    prefix = "\n" + tag
+    write = sys.stdout.write
     async for chunk in generator:
-        if hasattr(chunk, '__str__'):
-            print(f"\n{chunk}")
-        else:
-            print(f"\n未知数据类型: {type(chunk)}")
+        write(prefix)
+        write(chunk if isinstance(chunk, str) else str(chunk))
+        write("\n")
+    sys.stdout.flush()
 
-async def process_stream_to_api(generator):
+async def process_stream_to_api(generator, tag: str = ""):
     """将流式响应转换为API格式并输出"""
+    write = sys.stdout.write
     async for chunk in streaming_response(generator):
-        print(chunk.strip())
+        write(tag)
+        write(chunk.strip())
+        write("\n")
+    sys.stdout.flush()
+
+async def answer_question(idx: int, question: str, semaphore: asyncio.Semaphore):
+    """回答单个问题，分别以控制台格式和API格式输出"""
+    async with semaphore:
+        tag = f"[问题{idx}] "
+        print(f"\n\n===== {tag}{question} =====")
+        # 创建流式响应并输出到控制台
+        await process_stream_to_console(stream_react(question=question), tag)
+        # 创建流式响应并以API格式输出
+        await process_stream_to_api(stream_react(question=question), tag)
 
 async def main():
     # 要提问的问题
@@ -82,15 +142,9 @@ async def main():
         "今天是几号？"
     ]
     
-    for question in questions:
-        print(f"\n\n===== 问题: {question} =====")
-        print("\n--- 控制台输出格式 ---")
-        # 创建流式响应并输出到控制台
-        await process_stream_to_console(stream_react(question=question))
-        
-        print("\n--- API输出格式 ---")
-        # 创建流式响应并以API格式输出
-        await process_stream_to_api(stream_react(question=question))
+    # 各问题相互独立，并发执行；用信号量限制同时进行的请求数，避免触发服务端限流
+    semaphore = asyncio.Semaphore(3)
+    await asyncio.gather(*(answer_question(idx, q, semaphore) for idx, q in enumerate(questions, 1)))
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -1,21 +1,49 @@
 """
 旅行规划助手示例程序，展示如何使用minireact框架创建一个旅行规划智能体
 """
-import os
+import functools
 import sys
 import logging
 import random
+import re
 from datetime import datetime, timedelta
 # 设置语言模型配置
 from llm_hub import MultiLLMHub
-# 添加上级目录到模块搜索路径，以便导入minireact
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import minireact as mr
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+# 关键词对应的目的地，以及各预算档次的目的地，模块加载时构建一次
+_KEYWORD_PLACES = {
+    "海滩": ("三亚", "普吉岛", "巴厘岛", "马尔代夫", "夏威夷"),
+    "历史": ("西安", "北京", "罗马", "雅典", "开罗"),
+    "自然": ("张家界", "黄石公园", "阿尔卑斯山", "亚马逊雨林", "大堡礁"),
+    "美食": ("成都", "广州", "东京", "巴黎", "曼谷"),
+    "购物": ("上海", "香港", "纽约", "迪拜", "巴黎"),
+}
+# 所有关键词合并为一个正则，一次扫描即可找出查询中出现的全部关键词
+_KW_RE = re.compile("|".join(re.escape(key) for key in _KEYWORD_PLACES))
+_ALL_PLACES = tuple(place for places in _KEYWORD_PLACES.values() for place in places)
+_BUDGET_TIERS = {
+    "低": ("西安", "成都", "张家界", "北京", "广州"),
+    "中": ("上海", "东京", "曼谷", "三亚", "普吉岛"),
+    "高": ("纽约", "巴黎", "马尔代夫", "夏威夷", "迪拜"),
+}
+# 目的地到预算档次的反向索引
+_DEST_TIER = {place: tier for tier, places in _BUDGET_TIERS.items() for place in places}
+
+
+def _tier_ok(tier, budget_limit: float) -> bool:
+    """判断某个预算档次的目的地是否符合预算限制"""
+    if budget_limit < 5000:
+        return tier == "低"
+    if budget_limit < 15000:
+        return tier in ("低", "中")
+    return True
+
+
 # 定义一些旅行规划工具
 def search_destination(keywords: str, budget_limit: float = None) -> str:
     """
@@ -28,41 +56,21 @@ def search_destination(keywords: str, budget_limit: float = None) -> str:
     返回:
         推荐目的地列表
     """
-    destinations = {
-        "海滩": ["三亚", "普吉岛", "巴厘岛", "马尔代夫", "夏威夷"],
-        "历史": ["西安", "北京", "罗马", "雅典", "开罗"],
-        "自然": ["张家界", "黄石公园", "阿尔卑斯山", "亚马逊雨林", "大堡礁"],
-        "美食": ["成都", "广州", "东京", "巴黎", "曼谷"],
-        "购物": ["上海", "香港", "纽约", "迪拜", "巴黎"]
-    }
-    
-    results = []
-    for key, places in destinations.items():
-        if key in keywords.lower():
-            results.extend(places)
+    matched = set(_KW_RE.findall(keywords.lower()))
+    # 按关键词表的顺序输出，与关键词在查询中出现的顺序无关
+    results = [place for key, places in _KEYWORD_PLACES.items() if key in matched for place in places]
     
     if not results:
-        results = random.sample([item for sublist in destinations.values() for item in sublist], 3)
+        results = random.sample(_ALL_PLACES, 3)
     
     if budget_limit:
         # 模拟根据预算过滤目的地
-        budget_tier = {
-            "低": ["西安", "成都", "张家界", "北京", "广州"],
-            "中": ["上海", "东京", "曼谷", "三亚", "普吉岛"],
-            "高": ["纽约", "巴黎", "马尔代夫", "夏威夷", "迪拜"]
-        }
-        
-        if budget_limit < 5000:
-            filtered = [d for d in results if d in budget_tier["低"]]
-        elif budget_limit < 15000:
-            filtered = [d for d in results if d in budget_tier["低"] or d in budget_tier["中"]]
-        else:
-            filtered = results
-            
+        filtered = [d for d in results if _tier_ok(_DEST_TIER.get(d), budget_limit)]
         results = filtered if filtered else results
     
     return "、".join(results[:3]) if results else "未找到符合条件的目的地"
 
+@functools.lru_cache(maxsize=256)
 def get_attractions(destination: str) -> str:
     """
     获取指定目的地的主要景点
@@ -90,6 +98,7 @@ def get_attractions(destination: str) -> str:
     else:
         return f"暂无{destination}的景点信息"
 
+@functools.lru_cache(maxsize=256)
 def estimate_budget(destination: str, days: int, luxury_level: str = "标准") -> str:
     """
     估算旅行预算
@@ -181,6 +190,7 @@ def check_weather(destination: str, travel_date: str = None) -> str:
     else:
         return f"暂无{destination}的天气信息"
 
+@functools.lru_cache(maxsize=256)
 def generate_itinerary(destination: str, days: int) -> str:
     """
     生成旅行行程建议
@@ -257,11 +267,31 @@ travel_planner_signature = mr.Signature(
 )
 
 def main():
-    # 创建工具列表
-    tools = [search_destination, check_weather, estimate_budget, get_attractions, generate_itinerary]
-    lm = MultiLLMHub().setup_azure_openai()
-    # 创建ReAct智能体
-    agent = mr.ReAct(signature=travel_planner_signature, tools=tools, max_iters=10, lm=lm)
+    # 创建工具列表；get_attractions、estimate_budget和generate_itinerary为纯函数，已用lru_cache缓存结果，
+    # 并标记cache=True，同一次运行中重复的调用直接复用观察结果。
+    # check_weather默认使用当前日期，search_destination可能随机推荐，二者不缓存
+    tools = [
+        search_destination,
+        check_weather,
+        mr.Tool(estimate_budget, cache=True),
+        mr.Tool(get_attractions, cache=True),
+        mr.Tool(generate_itinerary, cache=True),
+    ]
+    hub = MultiLLMHub()
+    hub.setup_azure_openai()
+    lm = hub["azure"]
+    # 创建ReAct智能体。预算、天气、景点和行程只依赖推荐的目的地：规划模式下先用一次LLM调用确定目的地
+    # 和这些工具的参数，并发执行工具后再用一次LLM调用整理输出；规划无效时回退到逐步推理，
+    # 此时天气、景点、预算等查询相互独立，允许在一个回合中并行调用
+    agent = mr.ReAct(signature=travel_planner_signature, tools=tools, max_iters=10, lm=lm,
+                     enable_parallel_tool_execution=True,
+                     # 行程等观察结果较长，轨迹超过约4000个token时总结较早的步骤
+                     trajectory_token_budget=4000,
+                     plan_mode="dag",
+                     plan_hint={
+                         "root": "recommended_destination",
+                         "fanout": ["estimate_budget", "check_weather", "get_attractions", "generate_itinerary"],
+                     })
     
     print("欢迎使用旅行规划助手！")
     print("请告诉我你想去什么样的地方，旅行天数等信息")
@@ -6,15 +6,17 @@ minireact - 轻量级的 ReAct 框架实现
 
 from .module import Module
 from .tool import Tool
-from .signature import Signature, InputField, OutputField
+from .signature import Signature, InputField, OutputField, CompiledPrompt
 from .predict import Predict, ChainOfThought,PredictionCache
 from .react import ReAct
+from .cache import ResponseCache, enable_response_cache, disable_response_cache
 from .lm import (
-    chat, complete, 
+    chat, achat, batch_chat, abatch_chat, complete, 
     set_model, get_model,
     enable_debug, disable_debug,
     config as lm_config,
     LM,
+    aclose_http_clients,
     setup_openrouter,
     setup_ollama,
     setup_openai
@@ -35,12 +37,20 @@ __all__ = [
     "Signature",
     "InputField",
     "OutputField",
+    "CompiledPrompt",
     "Predict",
     "PredictionCache",
     "ChainOfThought",
     "ReAct",
+    # 响应缓存相关
+    "ResponseCache",
+    "enable_response_cache",
+    "disable_response_cache",
     # LM相关
     "chat",
+    "achat",
+    "batch_chat",
+    "abatch_chat",
     "complete",
     "set_model",
     "get_model",
@@ -48,6 +58,7 @@ __all__ = [
     "disable_debug",
     "lm_config",
     "LM",
+    "aclose_http_clients",
     "setup_openrouter",
     "setup_ollama",
     "setup_openai",
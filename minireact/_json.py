@@ -0,0 +1,53 @@
+"""
+JSON序列化模块，安装了orjson（可选依赖，见pyproject中的fast）时使用orjson，否则使用标准库json
+
+请求体、流式响应的每个数据块、工具参数和轨迹的序列化都在热点路径上，统一经过这里。
+"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，未安装时使用标准库json
+    orjson = None
+
+# orjson.JSONDecodeError是json.JSONDecodeError的子类，捕获这一个即可
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    解析JSON字符串或字节串
+    
+    参数:
+        data: JSON文本
+    
+    返回:
+        解析后的对象
+    
+    异常:
+        JSONDecodeError: 文本不是有效的JSON时
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any, sort_keys: bool = False) -> str:
+    """
+    将对象序列化为紧凑的JSON字符串，非ASCII字符原样输出，无法序列化的值转为字符串
+    
+    参数:
+        value: 要序列化的对象
+        sort_keys: 是否按键排序。排序后相同内容的对象总是得到相同的字符串，便于复用提示前缀缓存
+    
+    返回:
+        JSON字符串
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return orjson.dumps(value, default=str, option=option).decode()
+        except TypeError:  # 如超出64位的整数，交给标准库处理
+            pass
+    return json.dumps(value, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":"), default=str)
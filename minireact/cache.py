@@ -0,0 +1,105 @@
+"""
+响应缓存模块，缓存完整的智能体运行结果，相同的问题再次出现时直接返回
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class ResponseCache:
+    """
+    带过期时间的内存LRU缓存
+    
+    用于缓存ReAct等模块的最终结果。命中时跳过整个推理循环（多次LLM调用和工具调用）。
+    """
+    
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 300.0):
+        """
+        初始化缓存
+        
+        参数:
+            maxsize: 最大缓存条目数
+            ttl: 缓存条目的有效期（秒），为None时永不过期
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """
+        根据任意可序列化的内容生成缓存键
+        
+        参数:
+            *parts: 组成缓存键的内容，字典按键排序后序列化
+        
+        返回:
+            缓存键
+        """
+        content = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.md5(content.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Any:
+        """获取缓存项，未命中或已过期时返回None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Any):
+        """设置缓存项，超出容量时淘汰最久未使用的条目"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# 全局响应缓存，默认关闭
+_response_cache: Optional[ResponseCache] = None
+
+
+def enable_response_cache(maxsize: int = 1024, ttl: Optional[float] = 300.0) -> ResponseCache:
+    """
+    启用全局响应缓存
+    
+    参数:
+        maxsize: 最大缓存条目数
+        ttl: 缓存条目的有效期（秒）
+    
+    返回:
+        响应缓存实例
+    """
+    global _response_cache
+    _response_cache = ResponseCache(maxsize=maxsize, ttl=ttl)
+    return _response_cache
+
+
+def disable_response_cache():
+    """禁用全局响应缓存"""
+    global _response_cache
+    _response_cache = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """获取全局响应缓存，未启用时返回None"""
+    return _response_cache
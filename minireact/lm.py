@@ -1,12 +1,25 @@
 """
 语言模型管理模块，基于标准OpenAI协议支持多种LLM
 """
+import asyncio
+import atexit
+import hashlib
 import os
 import json
+import random
+import threading
+import weakref
+import time
 import httpx
 from loguru import logger
-from typing import Any, Dict, List, Optional, Union, AsyncIterable
-from urllib.parse import urljoin
+from typing import Any, Awaitable, Dict, Iterator, List, Optional, Tuple, Union, AsyncIterable
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from urllib.parse import urljoin, urlparse
+
+from . import _json
 
 
 
@@ -15,6 +28,36 @@ class ContextWindowExceededError(Exception):
     pass
 
 
+@lru_cache(maxsize=256)
+def _normalize_api_base(api_base: str) -> str:
+    """
+    规范化API基础URL：以/结尾，标准OpenAI格式的URL补全v1/（Azure OpenAI有自己的格式）
+    
+    纯字符串函数，每个LM实例和快捷设置函数都会调用，结果按输入缓存
+    
+    参数:
+        api_base: API基础URL
+    
+    返回:
+        规范化后的URL
+    """
+    if not api_base.endswith('/'):
+        api_base += '/'
+    if not api_base.endswith('v1/') and 'azure.com' not in api_base:
+        api_base += 'v1/'
+    return api_base
+
+
+# 调试开关，由LMConfig.enable_debug/disable_debug设置；请求路径上直接读取模块变量
+_DEBUG = False
+
+# 保护LMConfig单例的创建，避免并发构造时重复加载环境变量配置
+_singleton_lock = threading.Lock()
+
+# from_env中单独处理、不作为通用配置项加载的环境变量
+_RESERVED_ENV_KEYS = frozenset({"LLM_MODEL", "LLM_API_KEY", "LLM_API_BASE"})
+
+
 class LMConfig:
     """
     语言模型配置管理器
@@ -25,11 +68,13 @@ class LMConfig:
     def __new__(cls):
         """创建或返回单例实例"""
         if cls._instance is None:
-            cls._instance = super(LMConfig, cls).__new__(cls)
-            cls._instance._config = {}
-            cls._instance._debug = False
-            # 从环境变量加载初始配置
-            cls._instance.from_env()
+            with _singleton_lock:
+                if cls._instance is None:
+                    instance = super(LMConfig, cls).__new__(cls)
+                    instance._config = {}
+                    # 从环境变量加载初始配置，完成后再发布实例，其他线程不会看到未初始化的配置
+                    instance.from_env()
+                    cls._instance = instance
         return cls._instance
     
     def set_model(self, model_name: str):
@@ -52,19 +97,9 @@ class LMConfig:
     
     def set_api_base(self, api_base: str):
         """设置API基础URL"""
-        # 确保URL格式正确
-        if not api_base.endswith('/'):
-            api_base += '/'
-        
-        # 只对标准OpenAI格式的URL添加v1，Azure OpenAI有自己的格式
-        if not api_base.endswith('v1/') and 'azure.com' not in api_base:
-            if api_base.endswith('/'):
-                api_base += 'v1/'
-            else:
-                api_base += '/v1/'
-        
+        api_base = _normalize_api_base(api_base)
         self._config["api_base"] = api_base
-        logger.info(f"设置API基址: {api_base}")
+        logger.info("设置API基址: {}", api_base)
     
     def set_api_key(self, api_key: str):
         """设置API密钥"""
@@ -80,41 +115,45 @@ class LMConfig:
     
     def enable_debug(self):
         """启用调试模式"""
-        self._debug = True
+        global _DEBUG
+        _DEBUG = True
         logger.info("已启用调试模式")
     
     def disable_debug(self):
         """禁用调试模式"""
-        self._debug = False
+        global _DEBUG
+        _DEBUG = False
         logger.info("已禁用调试模式")
         
     def is_debug_enabled(self) -> bool:
         """检查是否启用了调试模式"""
-        return self._debug
+        return _DEBUG
     
     def from_env(self):
         """从环境变量加载配置"""
+        # 对环境变量做一次快照，之后的读取都在普通字典上进行，不再逐项访问os.environ
+        env = dict(os.environ)
+        
         # 加载模型名称
-        model_name = os.environ.get("LLM_MODEL") or os.environ.get("OPENAI_MODEL", "gpt-3.5-turbo")
+        model_name = env.get("LLM_MODEL") or env.get("OPENAI_MODEL", "gpt-3.5-turbo")
         self.set_model(model_name)
         
         # 加载API基础URL和密钥
-        api_key = os.environ.get("OPENAI_API_KEY") or os.environ.get("LLM_API_KEY")
+        api_key = env.get("OPENAI_API_KEY") or env.get("LLM_API_KEY")
         if api_key:
             self.set_api_key(api_key)
             
-        api_base = os.environ.get("OPENAI_API_BASE") or os.environ.get("LLM_API_BASE")
+        api_base = env.get("OPENAI_API_BASE") or env.get("LLM_API_BASE")
         if api_base:
             self.set_api_base(api_base)
         
-        # 加载其他配置
-        for key, value in os.environ.items():
-            if key.startswith("LLM_") and key not in ["LLM_MODEL", "LLM_API_KEY", "LLM_API_BASE"]:
-                config_key = key[4:].lower()
-                self.set_config(config_key, value)
+        # 加载其他配置，直接写入配置字典
+        for key, value in env.items():
+            if key.startswith("LLM_") and key not in _RESERVED_ENV_KEYS:
+                self._config[key[4:].lower()] = value
         
         # 检查是否启用调试模式
-        if os.environ.get("LLM_DEBUG", "").lower() in ("1", "true", "yes"):
+        if env.get("LLM_DEBUG", "").lower() in ("1", "true", "yes"):
             self.enable_debug()
         
         return self
@@ -144,12 +183,419 @@ def disable_debug():
     config.disable_debug()
 
 
+# 进程内共享的HTTP客户端，所有请求复用同一个连接池，避免每次调用重新建立TCP/TLS连接。
+# 本机服务（如Ollama）使用单独的客户端，不读取代理等环境变量配置
+_shared_http_clients: Dict[bool, httpx.Client] = {}
+_shared_http_client_lock = threading.Lock()
+
+_LOOPBACK_HOSTS = frozenset({"localhost", "127.0.0.1", "::1", "[::1]"})
+
+# 连接池设置。ReAct两次LLM调用之间要执行工具，间隔常超过httpx默认的5秒空闲超时，
+# 因此延长空闲连接的保留时间，避免每一步都重新进行TCP/TLS握手
+_POOL_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=60.0)
+
+
+@lru_cache(maxsize=256)
+def _is_loopback(api_base: str) -> bool:
+    """判断API基础URL是否指向本机，每次创建客户端都会调用，结果按URL缓存"""
+    return urlparse(api_base).hostname in _LOOPBACK_HOSTS
+
+
+def get_http_client(local: bool = False) -> httpx.Client:
+    """
+    获取进程内共享的HTTP客户端
+    
+    参数:
+        local: 是否用于访问本机服务。本机客户端不读取HTTP_PROXY等环境变量，
+               避免回环请求被转发到代理
+    
+    返回:
+        带连接池的httpx.Client实例
+    """
+    client = _shared_http_clients.get(local)
+    if client is None:
+        with _shared_http_client_lock:
+            client = _shared_http_clients.get(local)
+            if client is None:
+                client = httpx.Client(
+                    limits=_POOL_LIMITS,
+                    timeout=60.0,
+                    trust_env=not local
+                )
+                _shared_http_clients[local] = client
+    return client
+
+
+# 异步HTTP客户端的连接与创建它的事件循环绑定，因此按事件循环分别共享。
+# 客户端内部持有事件循环的引用，弱引用键无法释放，改为在事件循环关闭时清理
+_shared_async_clients: Dict[asyncio.AbstractEventLoop, Dict[bool, httpx.AsyncClient]] = {}
+# 已挂接关闭清理的事件循环
+_watched_loops: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+
+
+def _watch_loop(loop: asyncio.AbstractEventLoop):
+    """
+    在事件循环关闭时关闭它的异步HTTP客户端，并释放该循环的客户端和信号量
+    
+    asyncio.run在关闭事件循环前已停止运行，此时仍可用run_until_complete等待客户端关闭。
+    
+    参数:
+        loop: 当前运行的事件循环
+    """
+    if loop in _watched_loops:
+        return
+    original_close = loop.close
+    
+    def close():
+        if loop.is_running() or loop.is_closed():
+            return original_close()
+        clients = _shared_async_clients.pop(loop, {})
+        _async_inflight_semaphores.pop(loop, None)
+        try:
+            for client in clients.values():
+                loop.run_until_complete(client.aclose())
+        except Exception as e:
+            logger.warning(f"关闭异步HTTP客户端失败: {e}")
+        finally:
+            original_close()
+    
+    try:
+        loop.close = close
+    except AttributeError:
+        # 部分事件循环实现不允许替换方法，只能依赖调用方执行aclose_http_clients
+        logger.debug("事件循环{}不支持关闭时清理异步HTTP客户端", type(loop).__name__)
+        return
+    _watched_loops.add(loop)
+
+
+def get_async_http_client(local: bool = False) -> httpx.AsyncClient:
+    """
+    获取当前事件循环内共享的异步HTTP客户端，必须在协程中调用
+    
+    参数:
+        local: 是否用于访问本机服务，含义同get_http_client
+    
+    返回:
+        带连接池的httpx.AsyncClient实例
+    """
+    loop = asyncio.get_running_loop()
+    _watch_loop(loop)
+    clients = _shared_async_clients.setdefault(loop, {})
+    client = clients.get(local)
+    if client is None:
+        client = clients[local] = httpx.AsyncClient(
+            limits=_POOL_LIMITS,
+            timeout=60.0,
+            trust_env=not local
+        )
+    return client
+
+
+# 异步请求的并发上限，asyncio.Semaphore与事件循环绑定，按事件循环分别创建，事件循环关闭时释放
+_async_inflight_semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+
+def _get_async_inflight_semaphore() -> asyncio.Semaphore:
+    """获取当前事件循环内限制并发LLM请求数的信号量，上限与同步请求相同，必须在协程中调用"""
+    loop = asyncio.get_running_loop()
+    semaphore = _async_inflight_semaphores.get(loop)
+    if semaphore is None:
+        _watch_loop(loop)
+        semaphore = _async_inflight_semaphores[loop] = asyncio.Semaphore(_inflight_limit())
+    return semaphore
+
+
+async def aclose_http_clients():
+    """
+    关闭当前事件循环内共享的异步HTTP客户端，必须在协程中调用
+    
+    适合放在应用的关闭钩子中（如FastAPI的shutdown事件），或在asyncio.run结束前调用，
+    避免事件循环关闭后遗留未关闭的连接。之后的请求会重新创建客户端。
+    """
+    clients = _shared_async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+@atexit.register
+def close_http_clients():
+    """关闭进程内共享的同步HTTP客户端，进程退出时自动调用。之后的请求会重新创建客户端"""
+    with _shared_http_client_lock:
+        clients = list(_shared_http_clients.values())
+        _shared_http_clients.clear()
+    for client in clients:
+        client.close()
+
+
+# 同时进行中的LLM请求数上限，可通过config.set_config("inflight_limit", n)或环境变量LLM_INFLIGHT_LIMIT设置
+_inflight_semaphore: Optional[threading.BoundedSemaphore] = None
+_inflight_lock = threading.Lock()
+
+
+def _get_inflight_semaphore() -> threading.BoundedSemaphore:
+    """获取限制并发LLM请求数的信号量，第一次使用时按配置创建"""
+    global _inflight_semaphore
+    if _inflight_semaphore is None:
+        with _inflight_lock:
+            if _inflight_semaphore is None:
+                _inflight_semaphore = threading.BoundedSemaphore(_inflight_limit())
+    return _inflight_semaphore
+
+
+def _inflight_limit() -> int:
+    """同时进行的LLM请求数上限，来自配置inflight_limit或环境变量LLM_INFLIGHT_LIMIT，默认8"""
+    return int(config.get_config("inflight_limit") or os.environ.get("LLM_INFLIGHT_LIMIT", 8))
+
+
+class _CircuitBreaker:
+    """
+    熔断器：短时间内连续失败达到阈值后暂停向该服务发送请求，冷却期过后只放行一个请求试探
+    
+    避免服务限流或故障时大量请求继续涌入，造成重试风暴。
+    """
+    
+    def __init__(self, threshold: int = 3, window: float = 30.0, cooldown: float = 30.0):
+        """
+        初始化熔断器
+        
+        参数:
+            threshold: 触发熔断的失败次数
+            window: 统计失败次数的时间窗口（秒）
+            cooldown: 熔断后的冷却时间（秒）
+        """
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self._failures: List[float] = []
+        self._opened_at: Optional[float] = None
+        # 半开状态下试探请求的开始时间，为None表示没有正在进行的试探
+        self._probing_since: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """
+        是否允许发送请求
+        
+        冷却期过后进入半开状态，只放行一个试探请求，其余请求在试探结束（记录成功或失败）前继续被拒绝。
+        试探请求被取消等原因没有记录结果时，超过一个冷却期后再放行新的试探。
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.cooldown:
+                return False
+            if self._probing_since is not None and now - self._probing_since < self.cooldown:
+                return False
+            self._probing_since = now
+            return True
+    
+    def record_success(self):
+        """记录一次成功请求，关闭熔断"""
+        with self._lock:
+            self._failures.clear()
+            self._opened_at = None
+            self._probing_since = None
+    
+    def record_failure(self):
+        """记录一次失败请求，窗口内失败次数达到阈值或试探请求失败时打开熔断"""
+        now = time.monotonic()
+        with self._lock:
+            self._failures = [t for t in self._failures if now - t < self.window]
+            self._failures.append(now)
+            if self._probing_since is not None:
+                # 试探失败，重新开始冷却
+                self._probing_since = None
+                self._opened_at = now
+            elif len(self._failures) >= self.threshold:
+                if self._opened_at is None or now - self._opened_at >= self.cooldown:
+                    logger.warning("LLM服务连续失败{}次，暂停请求{:.0f}秒", len(self._failures), self.cooldown)
+                self._opened_at = now
+
+
+# 每个API基础URL一个熔断器，一个服务出错不影响其他服务
+_circuit_breakers: Dict[str, _CircuitBreaker] = {}
+
+
+def _get_circuit_breaker(api_base: str) -> _CircuitBreaker:
+    """获取指定API基础URL的熔断器"""
+    breaker = _circuit_breakers.get(api_base)
+    if breaker is None:
+        breaker = _circuit_breakers.setdefault(api_base, _CircuitBreaker())
+    return breaker
+
+
+def _is_retryable_status(status_code: int) -> bool:
+    """限流和服务端错误视为服务故障，计入熔断统计"""
+    return status_code == 429 or status_code >= 500
+
+
+# 限流和服务端错误的重试：最多重试次数可通过config.set_config("max_retries", n)或环境变量LLM_MAX_RETRIES设置
+_DEFAULT_MAX_RETRIES = 3
+_RETRY_BASE_DELAY = 1.0
+_MAX_RETRY_DELAY = 30.0
+
+
+def _max_retries() -> int:
+    """获取请求失败后的最大重试次数"""
+    return int(config.get_config("max_retries", _DEFAULT_MAX_RETRIES))
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """
+    计算第attempt次重试（从0开始）前的等待时间
+    
+    服务端返回Retry-After（秒数或HTTP日期）时按其等待，否则按指数退避并加随机抖动，
+    避免大量请求在同一时刻重试。等待时间最长为_MAX_RETRY_DELAY秒。
+    
+    参数:
+        attempt: 已经重试的次数
+        response: 失败的响应，连接失败或超时时为None
+    
+    返回:
+        等待秒数
+    """
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0.0), _MAX_RETRY_DELAY)
+    return min(_RETRY_BASE_DELAY * 2 ** attempt + random.uniform(0, _RETRY_BASE_DELAY), _MAX_RETRY_DELAY)
+
+
+class _ChatCache:
+    """
+    聊天响应缓存：内存LRU在前，SQLite持久化在后
+    
+    相同的模型、消息和采样参数直接返回之前的响应，跨进程有效。
+    """
+    
+    def __init__(self, path: str, maxsize: int = 1024):
+        """
+        初始化缓存
+        
+        参数:
+            path: SQLite数据库文件路径
+            maxsize: 内存中保留的最大条目数
+        """
+        self.maxsize = maxsize
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        import sqlite3  # 只有用到聊天缓存时才加载
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """获取缓存的响应，未命中时返回None"""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                return value
+            row = self._db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value = _json.loads(row[0])
+            self._remember(key, value)
+            return value
+    
+    def set(self, key: str, value: Dict[str, Any]):
+        """保存响应"""
+        with self._lock:
+            self._remember(key, value)
+            self._db.execute("INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)", (key, _json.dumps(value)))
+            self._db.commit()
+    
+    def _remember(self, key: str, value: Dict[str, Any]):
+        """放入内存LRU，超出容量时淘汰最久未使用的条目"""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+
+_chat_cache: Optional[_ChatCache] = None
+_chat_cache_lock = threading.Lock()
+
+# 参与缓存键计算的采样参数
+_CACHE_SAMPLING_PARAMS = ("temperature", "top_p", "max_tokens")
+
+
+def _get_chat_cache() -> Optional[_ChatCache]:
+    """
+    获取聊天响应缓存，第一次使用时创建
+    
+    可通过config.set_config("cache_enabled", False)关闭，缓存目录由cache_dir配置（默认.minireact_cache）。
+    """
+    global _chat_cache
+    if not config.get_config("cache_enabled", True):
+        return None
+    if _chat_cache is None:
+        with _chat_cache_lock:
+            if _chat_cache is None:
+                cache_dir = config.get_config("cache_dir", ".minireact_cache")
+                _chat_cache = _ChatCache(os.path.join(cache_dir, "chat.sqlite"))
+    return _chat_cache
+
+
+def _lookup_chat_cache(model: str, api_base: Optional[str], messages: List[Dict[str, str]],
+                       params: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    查找缓存的聊天响应
+    
+    只有temperature为0（确定性采样）的请求默认参与缓存；其他温度下的结果本就应当变化，
+    需要通过config.set_config("cache_all_temperatures", True)显式开启。
+    
+    参数:
+        model: 模型名称
+        api_base: API基础URL
+        messages: 消息列表
+        params: 请求参数
+        
+    返回:
+        (缓存键, 缓存的响应)；不参与缓存时缓存键为None，未命中时响应为None
+    """
+    temperature = params.get("temperature", 0.7)
+    if temperature != 0 and not config.get_config("cache_all_temperatures", False):
+        return None, None
+    cache = _get_chat_cache()
+    if cache is None:
+        return None, None
+    
+    sampling = {name: params.get(name) for name in _CACHE_SAMPLING_PARAMS}
+    sampling["temperature"] = temperature
+    content = _json.dumps({"m": model, "b": api_base, "msgs": messages, "p": sampling}, sort_keys=True)
+    key = hashlib.blake2b(content.encode("utf-8"), digest_size=20).hexdigest()
+    cached = cache.get(key)
+    if cached is None:
+        return key, None
+    logger.debug("命中聊天响应缓存: 模型={}", model)
+    return key, dict(cached)
+
+
+def _store_chat_cache(key: Optional[str], result: Dict[str, Any]):
+    """保存聊天响应，key为None（不参与缓存）时不做任何事"""
+    if key is not None:
+        cache = _get_chat_cache()
+        if cache is not None:
+            cache.set(key, result)
+
+
 class OpenAIClient:
     """
     标准OpenAI协议客户端
     """
     
-    def __init__(self, api_base: str = None, api_key: str = None, timeout: float = 60.0):
+    def __init__(self, api_base: str = None, api_key: str = None, timeout: float = 60.0,
+                 http_client: Optional[httpx.Client] = None):
         """
         初始化OpenAI客户端
         
@@ -157,6 +603,7 @@ class OpenAIClient:
             api_base: API基础URL
             api_key: API密钥
             timeout: 请求超时时间
+            http_client: 自定义HTTP客户端，默认使用进程内共享的连接池
         """
         self.api_base = api_base or config.get_config("api_base", "https://api.openai.com/v1/")
         self.api_key = api_key or config.get_config("api_key", "")
@@ -166,38 +613,26 @@ class OpenAIClient:
         if not self.api_base.endswith('/'):
             self.api_base += '/'
             
-        # 创建HTTP客户端
-        headers = {}
+        # 构建请求头，HTTP客户端本身在多个实例之间共享
+        self.headers = {}
         if self.api_key:
-            headers["Authorization"] = f"Bearer {self.api_key}"
-        headers["Content-Type"] = "application/json"
+            self.headers["Authorization"] = f"Bearer {self.api_key}"
+        self.headers["Content-Type"] = "application/json"
         
-        self.client = httpx.Client(
-            base_url=self.api_base,
-            headers=headers,
-            timeout=timeout
-        )
+        self.client = http_client or get_http_client(local=_is_loopback(self.api_base))
     
-    def chat_completion(self, 
+    def _build_request(self,
                        model: str,
-                       messages: List[Dict[str, str]], 
-                       temperature: float = 0.7,
-                       max_tokens: Optional[int] = None,
-                       stream: bool = False,
-                       **kwargs) -> Dict[str, Any]:
+                       messages: List[Dict[str, str]],
+                       temperature: float,
+                       max_tokens: Optional[int],
+                       stream: bool,
+                       **kwargs) -> Tuple[str, Dict[str, Any]]:
         """
-        调用聊天完成API
+        构建聊天完成请求的URL和请求数据
         
-        参数:
-            model: 模型名称
-            messages: 消息列表
-            temperature: 温度参数
-            max_tokens: 最大令牌数
-            stream: 是否使用流式响应
-            **kwargs: 其他参数
-            
         返回:
-            API响应
+            (相对URL, 请求数据)
         """
         # 提取Azure API版本参数（如果有）
         api_version = kwargs.pop("api_version", None)
@@ -220,22 +655,144 @@ class OpenAIClient:
             # Azure OpenAI需要api-version查询参数
             url += f"?api-version={api_version}"
         
-        if config.is_debug_enabled():
-            logger.info(f"请求URL: {self.api_base}{url}")
-            logger.info(f"请求数据: {json.dumps(data, ensure_ascii=False)}")
+        return url, data
+    
+    def _post_with_retry(self, url: str, data: Dict[str, Any], model: str) -> httpx.Response:
+        """
+        发送请求，遇到限流、服务端错误、连接失败或超时时按退避策略重试
+        
+        只在第一次发送前检查熔断器，重试用尽后才计入一次失败，本次请求自身的重试不会触发熔断。
+        等待重试期间不占用并发请求名额。
+        
+        参数:
+            url: 相对于api_base的请求路径
+            data: 请求数据
+            model: 模型名称，用于日志
+            
+        返回:
+            最后一次请求的响应（可能仍是错误响应）
+            
+        异常:
+            httpx.TimeoutException, httpx.ConnectError: 重试用尽后仍然超时或连接失败
+        """
+        breaker = _get_circuit_breaker(self.api_base)
+        content = _json.dumps(data).encode("utf-8")
+        max_retries = _max_retries()
+        if not breaker.allow():
+            raise Exception(f"API调用失败: {self.api_base} 近期连续出错，已暂停请求，请稍后重试")
+        attempt = 0
+        while True:
+            response = None
+            try:
+                start = time.perf_counter()
+                with _get_inflight_semaphore():
+                    response = self.client.post(
+                        urljoin(self.api_base, url),
+                        content=content,
+                        headers=self.headers,
+                        timeout=self.timeout
+                    )
+                logger.debug("LLM请求完成: 模型={}, 状态码={}, 耗时={:.2f}s", model, response.status_code, time.perf_counter() - start)
+                if not _is_retryable_status(response.status_code):
+                    breaker.record_success()
+                    return response
+                if attempt >= max_retries:
+                    breaker.record_failure()
+                    return response
+            except (httpx.TimeoutException, httpx.ConnectError):
+                if attempt >= max_retries:
+                    breaker.record_failure()
+                    raise
+            delay = _retry_delay(attempt, response)
+            attempt += 1
+            logger.warning("LLM请求失败，{:.1f}秒后进行第{}次重试: 模型={}", delay, attempt, model)
+            time.sleep(delay)
+    
+    async def _apost_with_retry(self, url: str, data: Dict[str, Any], model: str) -> httpx.Response:
+        """
+        _post_with_retry的异步版本，使用当前事件循环共享的异步HTTP客户端
+        
+        参数:
+            url: 相对于api_base的请求路径
+            data: 请求数据
+            model: 模型名称，用于日志
+            
+        返回:
+            最后一次请求的响应（可能仍是错误响应）
+        """
+        breaker = _get_circuit_breaker(self.api_base)
+        client = get_async_http_client(local=_is_loopback(self.api_base))
+        content = _json.dumps(data).encode("utf-8")
+        max_retries = _max_retries()
+        if not breaker.allow():
+            raise Exception(f"API调用失败: {self.api_base} 近期连续出错，已暂停请求，请稍后重试")
+        attempt = 0
+        while True:
+            response = None
+            try:
+                start = time.perf_counter()
+                async with _get_async_inflight_semaphore():
+                    response = await client.post(
+                        urljoin(self.api_base, url),
+                        content=content,
+                        headers=self.headers,
+                        timeout=self.timeout
+                    )
+                logger.debug("LLM请求完成: 模型={}, 状态码={}, 耗时={:.2f}s", model, response.status_code, time.perf_counter() - start)
+                if not _is_retryable_status(response.status_code):
+                    breaker.record_success()
+                    return response
+                if attempt >= max_retries:
+                    breaker.record_failure()
+                    return response
+            except (httpx.TimeoutException, httpx.ConnectError):
+                if attempt >= max_retries:
+                    breaker.record_failure()
+                    raise
+            delay = _retry_delay(attempt, response)
+            attempt += 1
+            logger.warning("LLM请求失败，{:.1f}秒后进行第{}次重试: 模型={}", delay, attempt, model)
+            await asyncio.sleep(delay)
+    
+    def chat_completion(self, 
+                       model: str,
+                       messages: List[Dict[str, str]], 
+                       temperature: float = 0.7,
+                       max_tokens: Optional[int] = None,
+                       stream: bool = False,
+                       **kwargs) -> Dict[str, Any]:
+        """
+        调用聊天完成API
+        
+        参数:
+            model: 模型名称
+            messages: 消息列表
+            temperature: 温度参数
+            max_tokens: 最大令牌数
+            stream: 是否使用流式响应
+            **kwargs: 其他参数
+            
+        返回:
+            API响应
+        """
+        url, data = self._build_request(model, messages, temperature, max_tokens, stream, **kwargs)
+        
+        if _DEBUG:
+            logger.info("请求URL: {}{}", self.api_base, url)
+            logger.info("请求数据: {}", json.dumps(data, ensure_ascii=False))
         
         try:
-            response = self.client.post(url, json=data)
+            response = self._post_with_retry(url, data, model)
             
-            if config.is_debug_enabled():
-                logger.info(f"响应状态: {response.status_code}")
-                logger.info(f"响应头: {dict(response.headers)}")
+            if _DEBUG:
+                logger.info("响应状态: {}", response.status_code)
+                logger.info("响应头: {}", dict(response.headers))
             
             # 检查响应状态
             if response.status_code == 200:
-                result = response.json()
-                if config.is_debug_enabled():
-                    logger.info(f"响应内容: {json.dumps(result, ensure_ascii=False)}")
+                result = _json.loads(response.content)
+                if _DEBUG:
+                    logger.info("响应内容: {}", json.dumps(result, ensure_ascii=False))
                 return result
             elif response.status_code == 400:
                 # 检查是否是上下文窗口超出异常
@@ -260,10 +817,147 @@ class OpenAIClient:
             logger.error(f"API调用异常: {e}")
             raise Exception(f"API调用异常: {str(e)}")
     
-    def __del__(self):
-        """清理资源"""
-        if hasattr(self, 'client'):
-            self.client.close()
+    async def achat_completion(self,
+                               model: str,
+                               messages: List[Dict[str, str]],
+                               temperature: float = 0.7,
+                               max_tokens: Optional[int] = None,
+                               **kwargs) -> Dict[str, Any]:
+        """
+        异步调用聊天完成API，使用当前事件循环共享的异步HTTP客户端
+        
+        参数:
+            model: 模型名称
+            messages: 消息列表
+            temperature: 温度参数
+            max_tokens: 最大令牌数
+            **kwargs: 其他参数
+            
+        返回:
+            API响应
+        """
+        url, data = self._build_request(model, messages, temperature, max_tokens, False, **kwargs)
+        
+        try:
+            response = await self._apost_with_retry(url, data, model)
+            
+            if response.status_code == 200:
+                return _json.loads(response.content)
+            error_data = response.json() if response.headers.get("content-type", "").startswith("application/json") else {"error": response.text}
+            error = error_data.get("error", "未知错误")
+            error_message = error.get("message", error) if isinstance(error, dict) else error
+            if response.status_code == 400 and "context length" in str(error_message).lower():
+                raise ContextWindowExceededError(error_message)
+            raise Exception(f"API调用失败 (状态码: {response.status_code}): {error_message}")
+        except httpx.TimeoutException:
+            raise Exception("请求超时，请检查网络连接或增加超时时间")
+        except httpx.ConnectError:
+            raise Exception("连接失败，请检查API基础URL和网络连接")
+    
+    def stream_chat_completion(self,
+                               model: str,
+                               messages: List[Dict[str, str]],
+                               temperature: float = 0.7,
+                               max_tokens: Optional[int] = None,
+                               **kwargs) -> Iterator[str]:
+        """
+        以流式方式调用聊天完成API，逐段返回生成的内容
+        
+        参数:
+            model: 模型名称
+            messages: 消息列表
+            temperature: 温度参数
+            max_tokens: 最大令牌数
+            **kwargs: 其他参数
+            
+        返回:
+            内容片段迭代器
+        """
+        url, data = self._build_request(model, messages, temperature, max_tokens, True, **kwargs)
+        
+        if _DEBUG:
+            logger.info("流式请求URL: {}{}", self.api_base, url)
+            logger.info("请求数据: {}", json.dumps(data, ensure_ascii=False))
+        
+        breaker = _get_circuit_breaker(self.api_base)
+        if not breaker.allow():
+            raise Exception(f"API调用失败: {self.api_base} 近期连续出错，已暂停请求，请稍后重试")
+        
+        try:
+            start = time.perf_counter()
+            first_chunk_at = None
+            with _get_inflight_semaphore(), self.client.stream(
+                "POST",
+                urljoin(self.api_base, url),
+                content=_json.dumps(data).encode("utf-8"),
+                headers=self.headers,
+                timeout=self.timeout
+            ) as response:
+                if _is_retryable_status(response.status_code):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                
+                if response.status_code != 200:
+                    response.read()
+                    error_data = response.json() if response.headers.get("content-type", "").startswith("application/json") else {"error": response.text}
+                    error = error_data.get("error", "未知错误")
+                    error_message = error.get("message", error) if isinstance(error, dict) else error
+                    if response.status_code == 400 and "context length" in str(error_message).lower():
+                        raise ContextWindowExceededError(error_message)
+                    raise Exception(f"API调用失败 (状态码: {response.status_code}): {error_message}")
+                
+                # 解析SSE数据行，每行形如 "data: {...}"，以 "data: [DONE]" 结束
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == "[DONE]":
+                        break
+                    chunk = _json.loads(payload)
+                    choices = chunk.get("choices")
+                    if not choices:
+                        continue
+                    content = (choices[0].get("delta") or {}).get("content")
+                    if content:
+                        if first_chunk_at is None:
+                            first_chunk_at = time.perf_counter()
+                            logger.debug("LLM流式响应首个片段: 模型={}, 耗时={:.2f}s", model, first_chunk_at - start)
+                        yield content
+            
+            logger.debug("LLM流式请求完成: 模型={}, 耗时={:.2f}s", model, time.perf_counter() - start)
+                        
+        except httpx.TimeoutException:
+            breaker.record_failure()
+            raise Exception("请求超时，请检查网络连接或增加超时时间")
+        except httpx.ConnectError:
+            breaker.record_failure()
+            raise Exception("连接失败，请检查API基础URL和网络连接")
+        except Exception as e:
+            if isinstance(e, ContextWindowExceededError):
+                raise e
+            logger.error(f"流式API调用异常: {e}")
+            raise Exception(f"API调用异常: {str(e)}")
+
+
+def _iter_stream(client: OpenAIClient, model: str, messages: List[Dict[str, str]], **kwargs) -> Iterator[str]:
+    """
+    迭代流式响应，出错时与非流式调用一样以错误信息作为内容返回
+    
+    参数:
+        client: OpenAI客户端
+        model: 模型名称
+        messages: 消息列表
+        **kwargs: 其他参数
+        
+    返回:
+        内容片段迭代器
+    """
+    try:
+        yield from client.stream_chat_completion(model=model, messages=messages, **kwargs)
+    except Exception as e:
+        logger.error(f"流式聊天调用失败: {e}")
+        yield f"调用语言模型时出错: {str(e)}"
 
 
 def setup_openrouter(api_key: str, model: str = "qwen/qwq-32b-preview"):
@@ -277,7 +971,7 @@ def setup_openrouter(api_key: str, model: str = "qwen/qwq-32b-preview"):
     config.set_api_key(api_key)
     config.set_api_base("https://openrouter.ai/api/v1/")
     set_model(model)
-    logger.info(f"已设置OpenRouter，使用模型: {model}")
+    logger.info("已设置OpenRouter，使用模型: {}", model)
     return config
 
 
@@ -293,7 +987,7 @@ def setup_ollama(model: str = "qwen3:8b", api_base: str = "http://localhost:1143
     config.set_api_key("")
     config.set_api_base(api_base)
     set_model(model)
-    logger.info(f"已设置Ollama，使用模型: {model}，API基址: {api_base}")
+    logger.info("已设置Ollama，使用模型: {}，API基址: {}", model, api_base)
     return config
 
 
@@ -309,70 +1003,181 @@ def setup_openai(api_key: str, model: str = "gpt-3.5-turbo", api_base: str = "ht
     config.set_api_key(api_key)
     config.set_api_base(api_base)
     set_model(model)
-    logger.info(f"已设置OpenAI，使用模型: {model}")
+    logger.info("已设置OpenAI，使用模型: {}", model)
     return config
 
 
-def chat(messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+def chat(messages: List[Dict[str, str]], stream: bool = False, **kwargs) -> Union[Dict[str, Any], Iterator[str]]:
     """
     使用标准OpenAI协议进行聊天
     
     参数:
         messages: 消息列表，格式为[{"role": "user", "content": "hello"}]
+        stream: 是否流式返回，为True时返回内容片段迭代器
         **kwargs: 其他参数，如temperature、max_tokens等
         
     返回:
-        包含回复内容的字典
+        包含回复内容的字典；流式模式下为内容片段迭代器
     """
     model = kwargs.pop("model", config.get_model())
     
+    if stream:
+        return _iter_stream(OpenAIClient(), model, messages, **kwargs)
+    
     # 显示调试日志
-    if config.is_debug_enabled():
-        logger.info(f"使用模型: {model}")
-        logger.info(f"API基础URL: {config.get_config('api_base')}")
-        logger.info(f"消息内容: {messages}")
+    if _DEBUG:
+        logger.info("使用模型: {}", model)
+        logger.info("API基础URL: {}", config.get_config('api_base'))
+        logger.info("消息内容: {}", messages)
     else:
-        logger.info(f"使用模型: {model}")
+        logger.info("使用模型: {}", model)
     
     try:
         # 创建客户端并调用API
         client = OpenAIClient()
+        cache_key, cached = _lookup_chat_cache(model, client.api_base, messages, kwargs)
+        if cached is not None:
+            return cached
         response = client.chat_completion(model=model, messages=messages, **kwargs)
+        result = _build_result(response, model)
+        _store_chat_cache(cache_key, result)
+        return result
         
-        # 解析响应
-        choice = response["choices"][0]
-        content = choice["message"]["content"]
-        
-        # 构建标准响应格式
-        result = {
-            "content": content,
-            "model": response.get("model", model),
-            "usage": response.get("usage", {
-                "prompt_tokens": 0,
-                "completion_tokens": 0,
-                "total_tokens": 0,
-            })
-        }
+    except Exception as e:
+        logger.error(f"聊天API调用失败: {e}")
+        return {"content": f"调用语言模型时出错: {str(e)}", "error": str(e)}
+
+
+def _build_result(response: Dict[str, Any], model: str) -> Dict[str, Any]:
+    """
+    将API响应整理为标准响应格式
+    
+    参数:
+        response: chat/completions接口的响应
+        model: 请求使用的模型名称，响应中没有model字段时使用
         
-        return result
+    返回:
+        包含content、model和usage的字典
+    """
+    # 只在响应缺少usage（或为null）时才构造默认值
+    usage = response.get("usage") or {
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+    }
+    return {
+        "content": response["choices"][0]["message"]["content"],
+        "model": response.get("model", model),
+        "usage": usage,
+    }
+
+
+async def achat(messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+    """
+    使用标准OpenAI协议进行聊天的异步版本，多个请求可以在同一事件循环中并发进行
+    
+    参数:
+        messages: 消息列表
+        **kwargs: 其他参数，如temperature、max_tokens等
         
+    返回:
+        包含回复内容的字典，格式同chat
+    """
+    model = kwargs.pop("model", config.get_model())
+    try:
+        client = OpenAIClient()
+        cache_key, cached = _lookup_chat_cache(model, client.api_base, messages, kwargs)
+        if cached is not None:
+            return cached
+        response = await client.achat_completion(model=model, messages=messages, **kwargs)
+        result = _build_result(response, model)
+        _store_chat_cache(cache_key, result)
+        return result
     except Exception as e:
         logger.error(f"聊天API调用失败: {e}")
         return {"content": f"调用语言模型时出错: {str(e)}", "error": str(e)}
 
 
-def complete(prompt: str, **kwargs) -> str:
+async def _gather_chats(achat_fn, messages_list: List[List[Dict[str, str]]], concurrency: Optional[int],
+                        kwargs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    在当前事件循环中并发发起多个聊天请求
+    
+    参数:
+        achat_fn: 异步聊天函数，如achat或LM.achat
+        messages_list: 每个请求的消息列表
+        concurrency: 最大并发数，为None时不限制
+        kwargs: 每个请求共用的参数
+        
+    返回:
+        与messages_list顺序一致的响应列表
+    """
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+    
+    async def run(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        if semaphore is None:
+            return await achat_fn(messages, **kwargs)
+        async with semaphore:
+            return await achat_fn(messages, **kwargs)
+    
+    return await asyncio.gather(*(run(messages) for messages in messages_list))
+
+
+async def _run_and_close(coro: Awaitable[Any]) -> Any:
+    """运行协程，结束后关闭本事件循环的异步HTTP客户端；用于asyncio.run创建的临时事件循环"""
+    try:
+        return await coro
+    finally:
+        await aclose_http_clients()
+
+
+async def abatch_chat(messages_list: List[List[Dict[str, str]]], concurrency: Optional[int] = 16,
+                      **kwargs) -> List[Dict[str, Any]]:
+    """
+    并发执行多个聊天请求，所有请求共用当前事件循环的异步HTTP客户端和连接池
+    
+    参数:
+        messages_list: 每个请求的消息列表
+        concurrency: 最大并发数，为None时不限制
+        **kwargs: 每个请求共用的参数，同achat
+        
+    返回:
+        与messages_list顺序一致的响应列表，每个响应的格式同chat
+    """
+    return await _gather_chats(achat, messages_list, concurrency, kwargs)
+
+
+def batch_chat(messages_list: List[List[Dict[str, str]]], concurrency: Optional[int] = 16,
+               **kwargs) -> List[Dict[str, Any]]:
+    """
+    并发执行多个聊天请求的同步版本，参见abatch_chat。不能在运行中的事件循环内调用
+    
+    参数:
+        messages_list: 每个请求的消息列表
+        concurrency: 最大并发数，为None时不限制
+        **kwargs: 每个请求共用的参数，同chat
+        
+    返回:
+        与messages_list顺序一致的响应列表
+    """
+    return asyncio.run(_run_and_close(abatch_chat(messages_list, concurrency=concurrency, **kwargs)))
+
+
+def complete(prompt: str, stream: bool = False, **kwargs) -> Union[str, Iterator[str]]:
     """
     使用标准OpenAI协议完成文本
     
     参数:
         prompt: 输入提示
+        stream: 是否流式返回，为True时返回内容片段迭代器
         **kwargs: 其他参数
         
     返回:
-        完成的文本
+        完成的文本；流式模式下为内容片段迭代器
     """
     messages = [{"role": "user", "content": prompt}]
+    if stream:
+        return chat(messages, stream=True, **kwargs)
     response = chat(messages, **kwargs)
     return response["content"]
 
@@ -382,7 +1187,9 @@ class LM:
     语言模型类，兼容DSPy的LM实现
     """
     
-    def __init__(self, model_name: str, api_base: Optional[str] = None, api_key: Optional[str] = None, **kwargs):
+    def __init__(self, model_name: str, api_base: Optional[str] = None, api_key: Optional[str] = None,
+                 http_client: Optional[httpx.Client] = None, enable_prefix_caching: bool = False,
+                 transport: Optional[httpx.BaseTransport] = None, **kwargs):
         """
         初始化语言模型
         
@@ -390,6 +1197,10 @@ class LM:
             model_name: 模型名称
             api_base: API基础URL
             api_key: API密钥
+            http_client: 自定义HTTP客户端，默认使用进程内共享的连接池
+            enable_prefix_caching: 是否在请求中附带cache_prompt参数，请求服务端复用相同提示前缀的缓存
+                                   （llama.cpp等服务支持；OpenAI/vLLM会自动进行前缀缓存，无需开启）
+            transport: 自定义httpx传输层，提供时为该实例创建独立的HTTP客户端
             **kwargs: 其他配置参数
         """
         self.model_name = model_name
@@ -397,6 +1208,10 @@ class LM:
         # 保存实例特定的配置，不修改全局配置
         self.api_base = api_base
         self.api_key = api_key
+        if http_client is None and transport is not None:
+            http_client = httpx.Client(transport=transport, timeout=60.0)
+        self.http_client = http_client
+        self.enable_prefix_caching = enable_prefix_caching
         self.config = kwargs.copy()
         
         # 只有在实例化时才更新全局配置（保持向后兼容性）
@@ -412,71 +1227,133 @@ class LM:
         # 设置当前模型
         set_model(self.model_name)
         
-        logger.info(f"已初始化LM: {self.model_name}, API Base: {api_base or '(使用全局配置)'}")
+        logger.info("已初始化LM: {}, API Base: {}", self.model_name, api_base or '(使用全局配置)')
     
-    def chat(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+    def chat(self, messages: List[Dict[str, str]], stream: bool = False, **kwargs) -> Union[Dict[str, Any], Iterator[str]]:
         """
         使用语言模型进行聊天
         
         参数:
             messages: 消息列表
+            stream: 是否流式返回，为True时返回内容片段迭代器
             **kwargs: 其他参数
             
         返回:
-            聊天响应
+            聊天响应；流式模式下为内容片段迭代器
         """
         # 使用实例特定的配置
         client = OpenAIClient(
             api_base=self.api_base,
-            api_key=self.api_key
+            api_key=self.api_key,
+            http_client=self.http_client
         )
         
         params = {"temperature": 0.7, **kwargs}
+        if self.enable_prefix_caching:
+            params.setdefault("cache_prompt", True)
         
         # 如果配置中有api_version，传递给chat_completion
         if hasattr(self, 'config') and 'api_version' in self.config:
             params["api_version"] = self.config["api_version"]
         
+        if stream:
+            return _iter_stream(client, self.model_name, messages, **params)
+        
         try:
+            cache_key, cached = _lookup_chat_cache(self.model_name, client.api_base, messages, params)
+            if cached is not None:
+                return cached
             response = client.chat_completion(
                 model=self.model_name,
                 messages=messages,
                 **params
             )
+            result = _build_result(response, self.model_name)
+            _store_chat_cache(cache_key, result)
+            return result
             
-            # 解析响应
-            choice = response["choices"][0]
-            content = choice["message"]["content"]
-            
-            # 构建标准响应格式
-            result = {
-                "content": content,
-                "model": response.get("model", self.model_name),
-                "usage": response.get("usage", {
-                    "prompt_tokens": 0,
-                    "completion_tokens": 0,
-                    "total_tokens": 0,
-                })
-            }
+        except Exception as e:
+            logger.error(f"LM实例聊天调用失败: {e}")
+            return {"content": f"调用语言模型时出错: {str(e)}", "error": str(e)}
+    
+    async def achat(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        """
+        使用语言模型进行聊天的异步版本
+        
+        异步请求使用当前事件循环共享的异步HTTP客户端，不使用实例的http_client/transport（它们是同步客户端）。
+        
+        参数:
+            messages: 消息列表
+            **kwargs: 其他参数
             
+        返回:
+            聊天响应，格式同chat
+        """
+        client = OpenAIClient(api_base=self.api_base, api_key=self.api_key, http_client=self.http_client)
+        
+        params = {"temperature": 0.7, **kwargs}
+        if self.enable_prefix_caching:
+            params.setdefault("cache_prompt", True)
+        if 'api_version' in self.config:
+            params["api_version"] = self.config["api_version"]
+        
+        try:
+            cache_key, cached = _lookup_chat_cache(self.model_name, client.api_base, messages, params)
+            if cached is not None:
+                return cached
+            response = await client.achat_completion(model=self.model_name, messages=messages, **params)
+            result = _build_result(response, self.model_name)
+            _store_chat_cache(cache_key, result)
             return result
-            
         except Exception as e:
             logger.error(f"LM实例聊天调用失败: {e}")
             return {"content": f"调用语言模型时出错: {str(e)}", "error": str(e)}
     
-    def complete(self, prompt: str, **kwargs) -> str:
+    async def abatch_chat(self, messages_list: List[List[Dict[str, str]]], concurrency: Optional[int] = 16,
+                          **kwargs) -> List[Dict[str, Any]]:
+        """
+        使用语言模型并发执行多个聊天请求
+        
+        参数:
+            messages_list: 每个请求的消息列表
+            concurrency: 最大并发数，为None时不限制
+            **kwargs: 每个请求共用的参数
+            
+        返回:
+            与messages_list顺序一致的响应列表
+        """
+        return await _gather_chats(self.achat, messages_list, concurrency, kwargs)
+    
+    def batch_chat(self, messages_list: List[List[Dict[str, str]]], concurrency: Optional[int] = 16,
+                   **kwargs) -> List[Dict[str, Any]]:
+        """
+        并发执行多个聊天请求的同步版本，参见abatch_chat
+        
+        参数:
+            messages_list: 每个请求的消息列表
+            concurrency: 最大并发数，为None时不限制
+            **kwargs: 每个请求共用的参数
+            
+        返回:
+            与messages_list顺序一致的响应列表
+        """
+        return asyncio.run(_run_and_close(self.abatch_chat(messages_list, concurrency=concurrency, **kwargs)))
+    
+    def complete(self, prompt: str, stream: bool = False, **kwargs) -> Union[str, Iterator[str]]:
         """
         使用语言模型完成文本
         
         参数:
             prompt: 输入提示
+            stream: 是否流式返回，为True时返回内容片段迭代器
             **kwargs: 其他参数
             
         返回:
-            完成的文本
+            完成的文本；流式模式下为内容片段迭代器
         """
         messages = [{"role": "user", "content": prompt}]
+        if stream:
+            return self.chat(messages, stream=True, **kwargs)
         response = self.chat(messages, **kwargs)
         return response["content"]
     
@@ -1,7 +1,10 @@
 """
 模块基类，所有处理组件都继承自该类
 """
-from typing import Any, Dict
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from .lm import _run_and_close
 
 
 class Module:
@@ -42,4 +45,40 @@ class Module:
         返回:
             处理结果
         """
-        raise NotImplementedError("子类必须实现forward方法") 
\ No newline at end of file
+        raise NotImplementedError("子类必须实现forward方法")
+    
+    async def abatch(self, inputs: List[Dict[str, Any]], concurrency: Optional[int] = None) -> List[Any]:
+        """
+        并发处理多组输入
+        
+        每组输入在线程池中独立调用一次模块，各次调用的LLM请求因此可以同时进行。
+        
+        参数:
+            inputs: 输入参数字典列表，每个字典作为一次调用的关键字参数
+            concurrency: 最大并发数，默认不限制
+            
+        返回:
+            与inputs顺序一致的结果列表
+        """
+        semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+        
+        async def run(kwargs: Dict[str, Any]) -> Any:
+            if semaphore is None:
+                return await asyncio.to_thread(self, **kwargs)
+            async with semaphore:
+                return await asyncio.to_thread(self, **kwargs)
+        
+        return await asyncio.gather(*(run(dict(kwargs)) for kwargs in inputs))
+    
+    def batch(self, inputs: List[Dict[str, Any]], concurrency: Optional[int] = None) -> List[Any]:
+        """
+        并发处理多组输入的同步版本，参见abatch。结束时关闭本次事件循环的异步HTTP客户端
+        
+        参数:
+            inputs: 输入参数字典列表
+            concurrency: 最大并发数，默认不限制
+            
+        返回:
+            与inputs顺序一致的结果列表
+        """
+        return asyncio.run(_run_and_close(self.abatch(inputs, concurrency=concurrency)))
@@ -1,25 +1,77 @@
 """
 预测模块，用于实现与语言模型的交互和推理
 """
+import asyncio
 import logging
 import os
-from typing import Any, Dict, Optional
-import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 import re
 import hashlib
 import pickle
 from pathlib import Path
 
 # 导入我们的LM模块替代直接使用litellm
-from .lm import chat as lm_chat, complete as lm_complete
+from .lm import achat as lm_achat, chat as lm_chat, complete as lm_complete, config as lm_config
 
 from .module import Module
 from .signature import Signature, ensure_signature
 from .prompt import predict_prompts
+from . import _json
 
 logger = logging.getLogger(__name__)
 
 
+def _dumps_sorted(value: Any) -> str:
+    """
+    将复杂对象序列化为键有序的紧凑JSON字符串
+    
+    相同内容的对象总是得到相同的字符串，使得提示前缀在多次调用间保持一致。
+    
+    参数:
+        value: 要序列化的对象
+        
+    返回:
+        JSON字符串；无法序列化时返回对象的字符串表示
+    """
+    try:
+        return _json.dumps(value, sort_keys=True)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+# 解析模型输出时使用的正则表达式，模块加载时编译一次
+# 字段值的结束位置：下一行以"字段名:"开头
+_NEXT_FIELD_RE = re.compile(r'\n\w+:')
+# 工具调用格式文本中的"工具："、"参数："和"思考："行
+_TOOL_LINE_RE = re.compile(r'工具[:：]\s*([^\s\n]+)')
+_ARGS_LINE_RE = re.compile(r'参数[:：]\s*(\{.*?\})', re.DOTALL)
+_THOUGHT_LINE_RE = re.compile(r'思考[:：]\s*([^\n]+)')
+# next_tool_args中的JSON对象（从第一个左花括号到最后一个右花括号）
+_JSON_OBJ_RE = re.compile(r'\{.*\}', re.DOTALL)
+# next_tool_name中的工具名称，支持连字符
+_TOOL_NAME_RE = re.compile(r'\b([a-zA-Z_][a-zA-Z0-9_-]+)\b')
+
+
+@lru_cache(maxsize=128)
+def _field_pattern(field_names: Tuple[str, ...]) -> "re.Pattern[str]":
+    """
+    按输出字段名编译提取字段的正则表达式
+    
+    字段值从"字段名:"之后开始，到下一个"换行+单词+冒号"或文本结尾为止。
+    较长的字段名排在前面，避免被作为前缀的较短字段名抢先匹配。
+    
+    参数:
+        field_names: 输出字段名
+        
+    返回:
+        带name和val分组的正则表达式
+    """
+    names = "|".join(re.escape(name) for name in sorted(field_names, key=len, reverse=True))
+    return re.compile(rf"(?P<name>{names}):(?P<val>.*?)(?=\n\w+:|\Z)", re.DOTALL)
+
+
 class Prediction(Dict[str, Any]):
     """
     预测结果类，用于存储语言模型的预测结果
@@ -35,17 +87,24 @@ class Prediction(Dict[str, Any]):
             key: 键名
             
         返回:
-            对应的值
-            
-        异常:
-            AttributeError: 当键不存在时
+            对应的值，键不存在时返回None
         """
-        try:
-            return self[key]
-        except KeyError:
-            # 对于缺失的属性，记录警告并返回None而不是抛出异常
-            logger.warning(f"访问了不存在的属性: '{key}'")
-            return None
+        value = dict.get(self, key)
+        # 调用方常用属性访问探测可选字段，缺失属于正常情况，只在调试日志中记录
+        if value is None and key not in self and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("访问了不存在的属性: '%s'", key)
+        return value
+
+
+# 原样填入提示的输入值类型，其余类型序列化为JSON
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+def _format_value(value: Any) -> Any:
+    """格式化输入值，复杂对象序列化为键有序的JSON"""
+    if not isinstance(value, _SCALAR_TYPES):
+        return _dumps_sorted(value)
+    return value
 
 
 class ChatAdapter:
@@ -64,20 +123,8 @@ class ChatAdapter:
         返回:
             格式化后的用户消息内容
         """
-        parts = []
-        
-        # 添加指令（如果有）
-        if signature.instructions:
-            parts.append(signature.instructions)
-        
-        # 添加输入字段
-        for name, value in inputs.items():
-            # 对于复杂对象，使用其字符串表示
-            if not isinstance(value, (str, int, float, bool, type(None))):
-                value = str(value)
-            parts.append(f"{name}: {value}")
-        
-        return "\n".join(parts)
+        # 指令和字段标签来自签名的预编译模板，这里只填入输入值
+        return signature.compile().render(inputs, _format_value)
     
     def create_messages(self, signature: Signature, inputs: Dict[str, Any]) -> list:
         """
@@ -118,10 +165,19 @@ class PredictionCache:
         if enabled:
             self.cache_dir.mkdir(exist_ok=True, parents=True)
     
-    def get_key(self, messages: list) -> str:
-        """生成缓存键"""
-        # 使用消息内容的哈希作为键
-        content = str(messages).encode('utf-8')
+    def get_key(self, messages: list, model: Optional[str] = None) -> str:
+        """
+        生成缓存键
+        
+        参数:
+            messages: 消息列表，包含签名指令、工具描述和轨迹
+            model: 模型标识，切换模型或API基址后旧的缓存不会被复用
+            
+        返回:
+            缓存键
+        """
+        # 使用模型标识和消息内容的哈希作为键
+        content = f"{model or ''}\n{messages}".encode('utf-8')
         return hashlib.md5(content).hexdigest()
     
     def get(self, key: str) -> Optional[dict]:
@@ -178,7 +234,10 @@ class Predict(Module):
         signature: Any,
         model: Optional[str] = None,
         chat_adapter: Optional[ChatAdapter] = None,
-        use_cache: bool = True
+        use_cache: bool = True,
+        lm_kwargs: Optional[Dict[str, Any]] = None,
+        stop_after_tool_args: bool = False,
+        fallback_models: Optional[List[Any]] = None
     ):
         """
         初始化预测模块
@@ -187,12 +246,21 @@ class Predict(Module):
             signature: 签名定义
             model: 要使用的语言模型名称
             chat_adapter: 聊天适配器实例
+            use_cache: 是否使用预测结果缓存
+            lm_kwargs: 每次调用语言模型时附加的请求参数
+            stop_after_tool_args: 是否以流式方式调用语言模型，并在next_tool_args的JSON对象
+                                  完整出现后立即停止接收，省去模型继续生成多余内容的时间
+            fallback_models: 备选模型列表，元素为模型名称或LM实例（可指向不同的服务）。设置后每次预测
+                             同时向主模型和所有备选模型发送请求，采用最先成功返回的响应
         """
         super().__init__()
         self.signature = ensure_signature(signature)
         self.model = model  # 这里只保存模型名称，具体模型通过LM模块获取
         self.chat_adapter = chat_adapter or ChatAdapter()
         self.use_cache = use_cache
+        self.lm_kwargs = dict(lm_kwargs or {})
+        self.stop_after_tool_args = stop_after_tool_args
+        self.fallback_models = list(fallback_models or [])
     
     def forward(self, **kwargs: Any) -> Prediction:
         """
@@ -214,25 +282,21 @@ class Predict(Module):
         if lm:
             logger.debug(f"LM实例详情: 模型={lm.model_name}, API基址={lm.api_base}")
         
-        # 准备输入
-        inputs = {k: v for k, v in kwargs.items() if k in self.signature.input_fields}
-        
-        # 创建消息
-        messages = self.chat_adapter.create_messages(self.signature, inputs)
-        
-        # 检查缓存
-        if self.use_cache:
-            cache_key = prediction_cache.get_key(messages)
-            cached_response = prediction_cache.get(cache_key)
-            if cached_response:
-                logger.info("使用缓存的预测结果")
-                return Prediction(**cached_response)
+        messages, cache_key, cached = self._prepare(kwargs, lm)
+        if cached is not None:
+            return cached
 
         try:
             # 调用语言模型
-            params = {"temperature": 0.1}  # 使用较低的温度以获得更确定性的回答
+            params = {"temperature": 0.1, **self.lm_kwargs}  # 使用较低的温度以获得更确定性的回答
             
-            if lm:
+            if self.stop_after_tool_args:
+                if self.model and not lm:
+                    params["model"] = self.model
+                response = self._chat_until_tool_args(messages, params, lm)
+            elif self.fallback_models:
+                response = self._race_chat(messages, params, lm)
+            elif lm:
                 # 如果传递了lm实例，使用它
                 logger.debug(f"使用传递的LM实例: {lm.model_name}, API基址: {lm.api_base}")
                 logger.debug(f"LM实例配置: {getattr(lm, 'config', {})}")
@@ -248,143 +312,393 @@ class Predict(Module):
                 response = lm_chat(messages, **params)
                 logger.debug(f"lm_chat返回响应: {response}")
             
-            # 提取回答内容
-            content = response["content"]
+            return self._parse_response(response, cache_key)
+            
+        except Exception as e:
+            logger.error(f"预测时发生错误: {e}")
+            # 返回空预测结果
+            return Prediction()
+
+
+    def _prepare(self, kwargs: Dict[str, Any], lm: Any = None) -> Tuple[list, Optional[str], Optional[Prediction]]:
+        """
+        构建请求消息并检查预测缓存
+        
+        参数:
+            kwargs: 输入参数
+            lm: 语言模型实例，为None时使用全局配置
             
-            # 解析回答，提取输出字段
-            outputs = {}
+        返回:
+            (消息列表, 缓存键, 缓存命中时的预测结果)；未启用缓存时缓存键为None
+        """
+        # 准备输入，按签名中的字段顺序排列，使提示前缀在多次调用间保持一致（轨迹字段始终在最后），
+        # 便于服务端复用前缀缓存
+        inputs = {k: kwargs[k] for k in self.signature.input_fields if k in kwargs}
+        
+        # 创建消息
+        messages = self.chat_adapter.create_messages(self.signature, inputs)
+        
+        # 检查缓存
+        cache_key = None
+        if self.use_cache:
+            if lm:
+                model_id = f"{lm.model_name}@{lm.api_base or ''}"
+            else:
+                model_id = self.model or lm_config.get_model()
+            cache_key = prediction_cache.get_key(messages, model_id)
+            cached_response = prediction_cache.get(cache_key)
+            if cached_response:
+                logger.info("使用缓存的预测结果")
+                return messages, cache_key, Prediction(**cached_response)
+        return messages, cache_key, None
+    
+    async def aforward(self, **kwargs: Any) -> Prediction:
+        """
+        执行预测的异步版本，通过共享的异步HTTP客户端调用语言模型，不占用线程
+        
+        参数:
+            **kwargs: 输入参数，可包含lm指定语言模型实例
             
-            # 首先检查是否是错误消息
-            if "调用语言模型时出错" in content or "请求超时" in content or "网络连接" in content:
-                logger.error(f"检测到LLM调用错误: {content}")
-                # 返回默认的错误处理结果
-                outputs = {
-                    "next_tool_name": "finish",
-                    "next_tool_args": {
-                        "reasoning": "系统遇到网络问题，请稍后重试",
-                        "answer": "抱歉，系统暂时无法处理您的请求，请稍后重试。"
-                    }
+        返回:
+            预测结果
+        """
+        lm = kwargs.pop("lm", None)
+        messages, cache_key, cached = self._prepare(kwargs, lm)
+        if cached is not None:
+            return cached
+        
+        try:
+            params = {"temperature": 0.1, **self.lm_kwargs}
+            if self.fallback_models:
+                response = await self._arace_chat(messages, params, lm)
+            elif lm:
+                response = await lm.achat(messages, **params)
+            else:
+                if self.model:
+                    params["model"] = self.model
+                response = await lm_achat(messages, **params)
+            return self._parse_response(response, cache_key)
+        except Exception as e:
+            logger.error(f"预测时发生错误: {e}")
+            return Prediction()
+    
+    async def abatch(self, inputs: List[Dict[str, Any]], concurrency: Optional[int] = 16) -> List[Prediction]:
+        """
+        并发执行多组预测
+        
+        与Module.abatch不同，各次预测直接在事件循环中发起异步请求，不经过线程池。
+        
+        参数:
+            inputs: 输入参数字典列表
+            concurrency: 最大并发数，为None时不限制
+            
+        返回:
+            与inputs顺序一致的预测结果列表
+        """
+        semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+        
+        async def run(kwargs: Dict[str, Any]) -> Prediction:
+            if semaphore is None:
+                return await self.aforward(**kwargs)
+            async with semaphore:
+                return await self.aforward(**kwargs)
+        
+        return await asyncio.gather(*(run(dict(kwargs)) for kwargs in inputs))
+    
+    def _chat_candidates(self, lm: Any = None) -> List[Any]:
+        """参与竞速的模型：主模型（LM实例或模型名称）在前，其后是备选模型"""
+        primary = lm if lm is not None else (self.model or lm_config.get_model())
+        return [primary, *self.fallback_models]
+    
+    def _race_chat(self, messages: list, params: Dict[str, Any], lm: Any = None) -> Dict[str, Any]:
+        """
+        同时向主模型和备选模型发送请求，返回最先成功的响应
+        
+        同步HTTP请求无法中途取消，落后的请求在后台线程中自然结束，结果被丢弃。
+        
+        参数:
+            messages: 消息列表
+            params: 请求参数
+            lm: 主模型的LM实例，为None时使用self.model或全局配置
+            
+        返回:
+            最先成功的响应；全部失败时返回最后一个失败的响应
+        """
+        def call(candidate: Any) -> Dict[str, Any]:
+            if isinstance(candidate, str):
+                return lm_chat(messages, **{**params, "model": candidate})
+            return candidate.chat(messages, **params)
+        
+        candidates = self._chat_candidates(lm)
+        executor = ThreadPoolExecutor(max_workers=len(candidates))
+        try:
+            futures = [executor.submit(call, candidate) for candidate in candidates]
+            response = None
+            for future in as_completed(futures):
+                response = future.result()
+                if "error" not in response:
+                    break
+            return response
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def _arace_chat(self, messages: list, params: Dict[str, Any], lm: Any = None) -> Dict[str, Any]:
+        """
+        _race_chat的异步版本，得到成功的响应后取消其余请求
+        
+        参数:
+            messages: 消息列表
+            params: 请求参数
+            lm: 主模型的LM实例，为None时使用self.model或全局配置
+            
+        返回:
+            最先成功的响应；全部失败时返回最后一个失败的响应
+        """
+        async def call(candidate: Any) -> Dict[str, Any]:
+            if isinstance(candidate, str):
+                return await lm_achat(messages, **{**params, "model": candidate})
+            return await candidate.achat(messages, **params)
+        
+        pending = {asyncio.ensure_future(call(candidate)) for candidate in self._chat_candidates(lm)}
+        response = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    response = task.result()
+                    if "error" not in response:
+                        return response
+            return response
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _parse_response(self, response: Dict[str, Any], cache_key: Optional[str]) -> Prediction:
+        """
+        解析语言模型的回复，提取各输出字段，并在启用缓存时保存结果
+        
+        参数:
+            response: chat/achat返回的响应字典
+            cache_key: 预测缓存键，未启用缓存时为None
+            
+        返回:
+            预测结果
+        """
+        # 提取回答内容
+        content = response["content"]
+        # 输出字段名在整个解析过程中只取一次，签名可被修改，因此不跨调用保存
+        field_names = tuple(self.signature.output_fields)
+        
+        # 解析回答，提取输出字段
+        outputs = {}
+        llm_failed = False
+        
+        # 首先检查是否是错误消息
+        if "调用语言模型时出错" in content or "请求超时" in content or "网络连接" in content:
+            logger.error(f"检测到LLM调用错误: {content}")
+            llm_failed = True
+            # 返回默认的错误处理结果
+            outputs = {
+                "next_tool_name": "finish",
+                "next_tool_args": {
+                    "reasoning": "系统遇到网络问题，请稍后重试",
+                    "answer": "抱歉，系统暂时无法处理您的请求，请稍后重试。"
                 }
-                for field_name in self.signature.output_fields:
+            }
+            for field_name in field_names:
+                if field_name == "reasoning":
+                    outputs[field_name] = "系统遇到网络问题"
+                elif field_name == "answer":
+                    outputs[field_name] = "抱歉，系统暂时无法处理您的请求，请稍后重试。"
+                elif field_name not in outputs:
+                    outputs[field_name] = content
+        # 检查是否是完整的工具调用格式文本（如日志显示的问题）
+        elif "思考：" in content and "工具：" in content and "参数：" in content:
+            logger.debug(f"检测到完整的工具调用格式，进行解析: {content[:200]}...")
+            
+            # 提取工具名：寻找"工具："后的内容
+            tool_match = _TOOL_LINE_RE.search(content)
+            
+            if tool_match:
+                tool_name = tool_match.group(1).strip()
+                outputs["next_tool_name"] = tool_name
+                logger.debug(f"提取工具名: {tool_name}")
+                
+                # 提取参数：寻找"参数："后的JSON
+                args_match = _ARGS_LINE_RE.search(content)
+                
+                if args_match:
+                    args_text = args_match.group(1)
+                    try:
+                        tool_args = _json.loads(args_text.strip())
+                        outputs["next_tool_args"] = tool_args
+                        logger.debug(f"提取工具参数: {tool_args}")
+                    except _json.JSONDecodeError as e:
+                        logger.warning(f"JSON 解析失败: {args_text}, 错误: {e}")
+                        outputs["next_tool_args"] = {}
+                else:
+                    outputs["next_tool_args"] = {}
+            
+            # 提取其他输出字段
+            for field_name in field_names:
+                if field_name not in outputs:
                     if field_name == "reasoning":
-                        outputs[field_name] = "系统遇到网络问题"
+                        # 提取"思考："后的内容
+                        thought_match = _THOUGHT_LINE_RE.search(content)
+                        if thought_match:
+                            outputs[field_name] = thought_match.group(1).strip()
+                        else:
+                            outputs[field_name] = "正在处理..."
                     elif field_name == "answer":
-                        outputs[field_name] = "抱歉，系统暂时无法处理您的请求，请稍后重试。"
-                    elif field_name not in outputs:
+                        # 对于answer字段，从参数中提取
+                        if "next_tool_args" in outputs and isinstance(outputs["next_tool_args"], dict):
+                            outputs[field_name] = outputs["next_tool_args"].get("answer", "正在处理...")
+                        else:
+                            outputs[field_name] = "正在处理..."
+                    else:
                         outputs[field_name] = content
-            # 检查是否是完整的工具调用格式文本（如日志显示的问题）
-            elif "思考：" in content and "工具：" in content and "参数：" in content:
-                logger.debug(f"检测到完整的工具调用格式，进行解析: {content[:200]}...")
-                
-                # 提取工具名：寻找"工具："后的内容
-                tool_pattern = r'工具[:：]\s*([^\s\n]+)'
-                tool_match = re.search(tool_pattern, content)
+        elif len(field_names) == 1 and f"{field_names[0]}:" not in content:
+            # 只有一个输出字段且回答中没有字段标记时，整个回答就是该字段的值，不必扫描
+            outputs[field_names[0]] = content
+        else:
+            # 一次扫描提取所有字段，每个字段取第一次出现的值
+            found = {}
+            for match in _field_pattern(field_names).finditer(content):
+                found.setdefault(match.group("name"), match.group("val"))
+            
+            for field_name in field_names:
+                value = found.get(field_name)
+                if value is None:
+                    # 字段出现在其他字段的值内部时一次扫描会跳过，退回到单独查找该字段：
+                    # 用partition定位字段标记，再截取到下一个字段标记之前
+                    _, sep, rest = content.partition(f"{field_name}:")
+                    if sep:
+                        next_field = _NEXT_FIELD_RE.search(rest)
+                        value = rest[:next_field.start()] if next_field else rest
                 
-                if tool_match:
-                    tool_name = tool_match.group(1).strip()
-                    outputs["next_tool_name"] = tool_name
-                    logger.debug(f"提取工具名: {tool_name}")
-                    
-                    # 提取参数：寻找"参数："后的JSON
-                    args_pattern = r'参数[:：]\s*(\{.*?\})'
-                    args_match = re.search(args_pattern, content, re.DOTALL)
+                if value is not None:
+                    value = value.strip()
                     
-                    if args_match:
-                        args_text = args_match.group(1)
+                    # 特殊处理next_tool_args字段，确保它是一个字典
+                    if field_name == "next_tool_args":
                         try:
-                            tool_args = json.loads(args_text.strip())
-                            outputs["next_tool_args"] = tool_args
-                            logger.debug(f"提取工具参数: {tool_args}")
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"JSON 解析失败: {args_text}, 错误: {e}")
-                            outputs["next_tool_args"] = {}
-                    else:
-                        outputs["next_tool_args"] = {}
-                
-                # 提取其他输出字段
-                for field_name in self.signature.output_fields:
-                    if field_name not in outputs:
-                        if field_name == "reasoning":
-                            # 提取"思考："后的内容
-                            thought_pattern = r'思考[:：]\s*([^\n]+)'
-                            thought_match = re.search(thought_pattern, content)
-                            if thought_match:
-                                outputs[field_name] = thought_match.group(1).strip()
-                            else:
-                                outputs[field_name] = "正在处理..."
-                        elif field_name == "answer":
-                            # 对于answer字段，从参数中提取
-                            if "next_tool_args" in outputs and isinstance(outputs["next_tool_args"], dict):
-                                outputs[field_name] = outputs["next_tool_args"].get("answer", "正在处理...")
+                            # 值本身就是JSON对象时（最常见的情况）直接解析，不必先用正则扫描
+                            if value.startswith('{') and value.endswith('}'):
+                                value = _json.loads(value)
+                            # 否则尝试从文本中提取JSON格式的参数
+                            elif (json_match := _JSON_OBJ_RE.search(value)):
+                                value = _json.loads(json_match.group(0))
                             else:
-                                outputs[field_name] = "正在处理..."
-                        else:
-                            outputs[field_name] = content
-            else:
-                # 使用原有的正则表达式提取字段逻辑
-                for field_name in self.signature.output_fields:
-                    # 使用更健壮的正则表达式匹配字段
-                    field_pattern = rf"{re.escape(field_name)}:(.*?)(?:\n\w+:|$)"
-                    field_match = re.search(field_pattern, content, re.DOTALL)
-                    
-                    if field_match:
-                        value = field_match.group(1).strip()
-                        
-                        # 特殊处理next_tool_args字段，确保它是一个字典
-                        if field_name == "next_tool_args":
-                            try:
-                                # 尝试从文本中提取JSON格式的参数
-                                json_pattern = r'\{.*\}'
-                                json_match = re.search(json_pattern, value, re.DOTALL)
-                                if json_match:
-                                    json_str = json_match.group(0)
-                                    value = json.loads(json_str)
-                                elif value.strip().startswith('{') and value.strip().endswith('}'):
-                                    value = json.loads(value)
-                                else:
-                                    # 如果无法提取JSON，创建一个空字典
-                                    logger.warning(f"无法解析工具参数: {value}")
-                                    value = {}
-                            except json.JSONDecodeError:
-                                logger.warning(f"无法解析工具参数为JSON: {value}")
+                                # 如果无法提取JSON，创建一个空字典
+                                logger.warning(f"无法解析工具参数: {value}")
                                 value = {}
-                        
-                        # 特殊处理next_tool_name字段，确保它只是工具名称
-                        elif field_name == "next_tool_name":
-                            # 去除可能的额外字符
-                            value = value.strip()
-                            # 如果工具名被其他字符包围，如'search'或[search]
-                            if (value.startswith("'") and value.endswith("'")) or \
-                            (value.startswith('"') and value.endswith('"')) or \
-                            (value.startswith("[") and value.endswith("]")):
-                                value = value[1:-1].strip()
-                            # 尝试匹配工具名称（支持连字符和完整名称）
-                            # 首先尝试匹配完整的工具名称（包含连字符）
-                            tool_name_match = re.search(r'\b([a-zA-Z_][a-zA-Z0-9_-]+)\b', value)
-                            if tool_name_match:
-                                value = tool_name_match.group(1)
-                            logger.info(f"解析工具名称为: {value}")
-                        
-                        outputs[field_name] = value
-                    else:
-                        # 如果找不到特定字段，使用整个内容
-                        outputs[field_name] = content
+                        except _json.JSONDecodeError:
+                            logger.warning(f"无法解析工具参数为JSON: {value}")
+                            value = {}
+                    
+                    # 特殊处理next_tool_name字段，确保它只是工具名称
+                    elif field_name == "next_tool_name":
+                        # 去除可能的额外字符
+                        value = value.strip()
+                        # 如果工具名被其他字符包围，如'search'或[search]
+                        if (value.startswith("'") and value.endswith("'")) or \
+                        (value.startswith('"') and value.endswith('"')) or \
+                        (value.startswith("[") and value.endswith("]")):
+                            value = value[1:-1].strip()
+                        # 尝试匹配工具名称（支持连字符和完整名称）
+                        # 首先尝试匹配完整的工具名称（包含连字符）
+                        tool_name_match = _TOOL_NAME_RE.search(value)
+                        if tool_name_match:
+                            value = tool_name_match.group(1)
+                        logger.info(f"解析工具名称为: {value}")
+                    
+                    outputs[field_name] = value
+                else:
+                    # 如果找不到特定字段，使用整个内容
+                    outputs[field_name] = content
+        
+        # 如果没有提取到任何字段，使用整个内容作为结果
+        if not outputs and field_names:
+            outputs[field_names[0]] = content
             
-            # 如果没有提取到任何字段，使用整个内容作为结果
-            if not outputs and self.signature.output_fields:
-                field_name = next(iter(self.signature.output_fields))
-                outputs[field_name] = content
-                
-            # 缓存结果
-            if self.use_cache:
-                prediction_cache.set(cache_key, outputs)
+        # 缓存结果，调用失败时的兜底结果不缓存，以便下次重新请求
+        if self.use_cache and not llm_failed and "error" not in response:
+            prediction_cache.set(cache_key, outputs)
 
-            return Prediction(**outputs)
+        return Prediction(**outputs)
+    
+    def _chat_until_tool_args(self, messages: list, params: Dict[str, Any], lm: Any = None) -> Dict[str, Any]:
+        """
+        以流式方式调用语言模型，next_tool_args的JSON对象结束后立即停止接收
+        
+        参数:
+            messages: 消息列表
+            params: 请求参数
+            lm: 语言模型实例，为None时使用全局配置
             
-        except Exception as e:
-            logger.error(f"预测时发生错误: {e}")
-            # 返回空预测结果
-            return Prediction()
+        返回:
+            与chat相同格式的响应字典
+        """
+        chunks = lm.chat(messages, stream=True, **params) if lm else lm_chat(messages, stream=True, **params)
+        
+        text = ""
+        args_start = -1
+        try:
+            for chunk in chunks:
+                text += chunk
+                if args_start < 0:
+                    marker = text.find("next_tool_args")
+                    if marker < 0:
+                        continue
+                    args_start = text.find("{", marker)
+                    if args_start < 0:
+                        continue
+                end = _find_json_end(text, args_start)
+                if end is not None:
+                    logger.debug("next_tool_args已完整，停止接收剩余输出")
+                    text = text[:end]
+                    break
+        finally:
+            # 提前结束时关闭生成器，释放底层HTTP连接
+            chunks.close()
+        
+        if text.startswith("调用语言模型时出错"):
+            return {"content": text, "error": text}
+        return {"content": text}
+
+
+def _find_json_end(text: str, start: int) -> Optional[int]:
+    """
+    查找从start处的左花括号开始的JSON对象的结束位置
+    
+    参数:
+        text: 文本
+        start: 左花括号的位置
+        
+    返回:
+        JSON对象结束后的位置；对象尚不完整时返回None
+    """
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
 
 
 class ChainOfThought(Predict):
@@ -406,13 +720,18 @@ class ChainOfThought(Predict):
             model: 要使用的语言模型名称
             chat_adapter: 聊天适配器实例
         """
-        # 添加思维链提示到指令
-        enhanced_signature = ensure_signature(signature)
+        # 添加思维链提示到指令。在副本上修改，调用方传入的签名可能被共享或重复使用，
+        # 直接修改会让指令随每次包装不断变长；已包含思维链提示的签名不再重复添加
+        signature = ensure_signature(signature)
         cot_instructions = predict_prompts["chain_of_thought"]
+        base_instructions = (signature.instructions or "").rstrip()
         
-        if enhanced_signature.instructions:
-            enhanced_signature.instructions = f"{enhanced_signature.instructions}\n\n{cot_instructions}"
+        if base_instructions.endswith(cot_instructions):
+            instructions = base_instructions
+        elif base_instructions:
+            instructions = f"{base_instructions}\n\n{cot_instructions}"
         else:
-            enhanced_signature.instructions = cot_instructions
+            instructions = cot_instructions
+        enhanced_signature = Signature(dict(signature.input_fields), dict(signature.output_fields), instructions)
         
         super().__init__(enhanced_signature, model, chat_adapter)
\ No newline at end of file
@@ -22,8 +22,24 @@ react_prompts = {
     # Template for finish tool description
     "finish_tool_desc": "Mark the task as completed. Indicates that sufficient information has been collected to produce output: {outputs}",
     
+    # Description of the parallel pseudo-tool
+    "parallel_tool_desc": "Call several independent tools at once and receive all their observations together. Use it only when the calls do not depend on each other's results. Arguments: {\"calls\": [{\"tool_name\": \"tool name\", \"tool_args\": {...}}, ...]}",
+    
     # Formatting template for tool descriptions
     "tool_desc_format": "({idx}) {name}{desc}",
+    
+    # Summarization prompt used when the trajectory exceeds the token budget
+    "summarize_trajectory": "Summarize the following earlier reasoning steps of an agent. Keep every fact, number and conclusion obtained from tool observations, and note which tools have already been called with which arguments. Be concise and output only the summary.",
+    
+    # Planning instructions for plan_mode="dag": decide the root output first, then list the dependent tool calls
+    "plan_instructions": [
+        "First determine {root}. The remaining outputs depend only on {root} and are produced by the tools below, which will all be called at once.",
+        "Provide {root} and tool_calls. tool_calls must be a single-line JSON array such as [{{\"tool_name\": \"tool name\", \"tool_args\": {{...}}}}], with one entry for each tool that is needed.",
+        "Only use the following tools:\n",
+    ],
+    
+    # Thought recorded in the trajectory for the planned parallel call in plan_mode="dag"
+    "plan_thought": "{root} is determined: {value}. Calling the tools that depend on it at once.",
 }
 
 # Prompt templates for prediction module
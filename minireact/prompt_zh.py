@@ -22,8 +22,24 @@ react_prompts = {
     # finish工具的描述模板
     "finish_tool_desc": "标记任务为完成。表示已收集到足够信息，可以产生输出：{outputs}",
     
+    # parallel伪工具的描述
+    "parallel_tool_desc": "同时调用多个相互独立的工具，并一次性获得所有观察结果。仅当这些调用不依赖彼此的结果时使用。参数格式：{\"calls\": [{\"tool_name\": \"工具名称\", \"tool_args\": {...}}, ...]}",
+    
     # 工具描述的格式化模板
     "tool_desc_format": "({idx}) {name}{desc}",
+    
+    # 轨迹超出token预算时用于总结较早步骤的提示
+    "summarize_trajectory": "请总结以下智能体较早的推理步骤。保留从工具观察结果中得到的所有事实、数字和结论，并注明已经用哪些参数调用过哪些工具。请简明扼要，只输出总结内容。",
+    
+    # plan_mode="dag"的规划指令：先确定根输出，再列出依赖它的工具调用
+    "plan_instructions": [
+        "请先确定{root}。其余输出只依赖{root}，由下列工具产生，这些工具会被同时调用。",
+        "请给出{root}和tool_calls。tool_calls必须是单行JSON数组，例如[{{\"tool_name\": \"工具名称\", \"tool_args\": {{...}}}}]，每个需要的工具一项。",
+        "只能使用以下工具：\n",
+    ],
+    
+    # plan_mode="dag"中规划出的并发调用在轨迹中记录的思考
+    "plan_thought": "已确定{root}: {value}，同时调用依赖它的工具",
 }
 
 # 预测模块的提示模板
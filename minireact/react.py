@@ -1,17 +1,41 @@
 """
 ReAct模块，实现推理和行动框架的核心逻辑
 """
+import asyncio
+import difflib
+import hashlib
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from loguru import logger
-from typing import Any, Callable, Dict, List, Literal, Optional
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
 
 # 导入上下文窗口异常处理
-from .lm import ContextWindowExceededError
+from .lm import ContextWindowExceededError, chat as lm_chat, config as lm_config
+from .cache import ResponseCache, get_response_cache
 
 from .module import Module
-from .predict import ChainOfThought, Prediction, Predict
+from .predict import ChainOfThought, Prediction, Predict, _format_value
 from .signature import Signature, InputField, OutputField, ensure_signature
 from .tool import Tool
 from .prompt import react_prompts
+from . import _json
+
+
+# 并行工具调用共用的线程池，避免每次调用parallel工具都创建和销毁线程
+_tool_executor: Optional[ThreadPoolExecutor] = None
+_tool_executor_lock = threading.Lock()
+
+
+def _get_tool_executor() -> ThreadPoolExecutor:
+    """获取并行执行工具调用的共享线程池，第一次使用时创建"""
+    global _tool_executor
+    if _tool_executor is None:
+        with _tool_executor_lock:
+            if _tool_executor is None:
+                _tool_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="minireact-tool")
+    return _tool_executor
 
 
 class ReAct(Module):
@@ -21,7 +45,10 @@ class ReAct(Module):
     它使用一系列工具来交互，并通过推理和观察来决定下一步行动。
     """
     
-    def __init__(self, signature: Any, tools: List[Callable], max_iters: int = 5,lm=None):
+    def __init__(self, signature: Any, tools: List[Callable], max_iters: int = 5,lm=None,
+                 enable_parallel_tool_execution: bool = False, enable_prompt_cache: bool = False,
+                 plan_mode: Optional[str] = None, plan_hint: Optional[Dict[str, Any]] = None,
+                 trajectory_token_budget: Optional[int] = None, keep_recent_steps: int = 2):
         """
         初始化ReAct实例
         
@@ -29,11 +56,24 @@ class ReAct(Module):
             signature: 任务签名，定义了输入和输出
             tools: 工具列表，可以是函数、可调用类或Tool实例
             max_iters: 最大迭代次数，默认为5
+            enable_parallel_tool_execution: 是否提供parallel工具，允许模型在一个回合中
+                                            同时调用多个相互独立的工具
+            enable_prompt_cache: 是否在请求中附带prompt_cache_key。同一个ReAct实例的指令和工具描述
+                                 固定不变，相同的键让OpenAI/Azure把请求路由到已缓存该前缀的服务器
+            plan_mode: 规划模式。为"dag"时先用一次LLM调用确定根输出和依赖它的工具调用，
+                       并发执行这些工具后再用一次LLM调用整理全部输出；规划无效时回退到逐步ReAct循环
+            plan_hint: plan_mode="dag"时的规划说明，形如{"root": 根输出字段名, "fanout": [工具名, ...]}，
+                       fanout中的工具只依赖根输出
+            trajectory_token_budget: 轨迹的token预算（估算值，如4000）。每轮都会重新发送完整轨迹，超出预算时
+                                     将较早的步骤总结为一段摘要，避免长轨迹的预填充开销随轮数平方增长。为None时不启用
+            keep_recent_steps: 总结轨迹时保留原文的最近步骤数
         """
         super().__init__()
         self.signature = signature = ensure_signature(signature)
         self.max_iters = max_iters
         self.lm = lm
+        self.trajectory_token_budget = trajectory_token_budget
+        self.keep_recent_steps = max(1, keep_recent_steps)
         
         # 将所有工具转换为Tool对象，并构建工具字典
         tools = [t if isinstance(t, Tool) else Tool(t) for t in tools]
@@ -42,12 +82,19 @@ class ReAct(Module):
         # 构建指令信息
         inputs = ", ".join([f"`{k}`" for k in signature.input_fields.keys()])
         outputs = ", ".join([f"`{k}`" for k in signature.output_fields.keys()])
-        instr = [f"{signature.instructions}\n"] if signature.instructions else []
         
         # 添加ReAct框架的指导说明，使用prompt.py中的模板
-        base_instructions = [instruction.format(inputs=inputs, outputs=outputs) 
-                            for instruction in react_prompts["base_instructions"]]
-        instr.extend(base_instructions)
+        instr = [instruction.format(inputs=inputs, outputs=outputs) 
+                 for instruction in react_prompts["base_instructions"]]
+        
+        # 并行调用工具，一个回合内的多个独立调用同时执行
+        if enable_parallel_tool_execution:
+            tools["parallel"] = Tool(
+                func=self._run_parallel,
+                name="parallel",
+                desc=react_prompts["parallel_tool_desc"],
+                args={"calls": {"type": List[Dict[str, Any]]}},
+            )
         
         # 创建与输出字段对应的args
         finish_args = {field_name: {"type": Any} for field_name in signature.output_fields}
@@ -60,10 +107,12 @@ class ReAct(Module):
         
         # 添加各个工具的描述
         for idx, tool in enumerate(tools.values()):
-            args = getattr(tool, "args")
-            desc = (f"，其描述为 <desc>{tool.desc}</desc>。" if tool.desc else "。").replace("\n", "  ")
-            desc += f" 它接受JSON格式的参数 {args}。"
-            instr.append(react_prompts["tool_desc_format"].format(idx=idx + 1, name=tool.name, desc=desc))
+            instr.append(_describe_tool(idx, tool))
+        
+        # 任务指令放在固定的框架说明和工具描述之后，使不同任务的智能体共享尽可能长的提示前缀，
+        # 提高服务端提示缓存的命中率；轨迹作为最后一个输入字段，每轮之间只有末尾发生变化
+        if signature.instructions:
+            instr.append(f"\n{signature.instructions}")
         
         # 创建ReAct签名
         react_signature = (
@@ -83,48 +132,464 @@ class ReAct(Module):
         
         # 保存配置
         self.tools = tools
+        # 工具集合在初始化后固定，预先建立名称元组和小写索引供错误提示和工具名称纠错使用
+        self._tool_names = tuple(tools)
+        # Predict不按Literal校验next_tool_name（Literal只用于在提示中列出可选工具），由推理循环检查
+        self._tool_name_set = frozenset(tools)
+        self._tool_names_by_lower = {name.lower(): name for name in reversed(self._tool_names)}
         self.react = Predict(react_signature)  # 用于每次迭代的预测
+        if enable_prompt_cache:
+            self.react.lm_kwargs["prompt_cache_key"] = _prompt_cache_key(react_signature.instructions)
+        react_signature.compile()  # 预先编译每次迭代都相同的指令部分
         if lm:
             self.react.lm = lm
         self.extract = ChainOfThought(fallback_signature)  # 用于从轨迹提取最终结果
         if lm:
             self.extract.lm = lm
+        
+        # 规划模式：先确定根输出，再并发调用只依赖它的工具
+        self.plan_mode = plan_mode
+        self.plan_hint = plan_hint
+        self.plan = None
+        if plan_mode == "dag":
+            self.plan = self._build_plan_predictor(plan_hint)
+            if lm:
+                self.plan.lm = lm
+        elif plan_mode is not None:
+            raise ValueError(f"不支持的规划模式: {plan_mode}")
+    
+    def _build_plan_predictor(self, plan_hint: Optional[Dict[str, Any]]) -> Predict:
+        """
+        根据规划说明创建规划用的预测模块
+        
+        参数:
+            plan_hint: 规划说明，{"root": 根输出字段名, "fanout": [工具名, ...]}
+            
+        返回:
+            输出根字段和tool_calls的Predict实例
+        """
+        if not plan_hint or "root" not in plan_hint or not plan_hint.get("fanout"):
+            raise ValueError("plan_mode='dag'需要提供plan_hint={'root': ..., 'fanout': [...]}")
+        
+        root = plan_hint["root"]
+        if root not in self.signature.output_fields:
+            raise ValueError(f"plan_hint中的根字段{root}不是签名的输出字段")
+        unknown = [name for name in plan_hint["fanout"] if name not in self.tools or name in ("parallel", "finish")]
+        if unknown:
+            raise ValueError(f"plan_hint中的工具不存在: {unknown}")
+        
+        instr = [instruction.format(root=root) for instruction in react_prompts["plan_instructions"]]
+        for idx, name in enumerate(plan_hint["fanout"]):
+            instr.append(_describe_tool(idx, self.tools[name]))
+        if self.signature.instructions:
+            instr.append(f"\n{self.signature.instructions}")
+        
+        plan_signature = Signature(
+            {**self.signature.input_fields},
+            {root: self.signature.output_fields[root]},
+            "\n".join(instr),
+        ).append("tool_calls", OutputField(), type_=List[Dict[str, Any]])
+        return Predict(plan_signature)
+    
+    def _forward_dag(self, input_args: Dict[str, Any]) -> Optional[Prediction]:
+        """
+        规划模式的执行过程：一次LLM调用完成规划，并发执行工具，再一次LLM调用整理输出
+        
+        参数:
+            input_args: 调用forward时的参数，不会被修改
+            
+        返回:
+            预测结果；规划无效（如调用了规划之外的工具）时返回None，由调用方回退到逐步ReAct循环
+        """
+        lm = input_args.get("lm", self.lm)
+        inputs = {k: v for k, v in input_args.items() if k not in ("lm", "max_iters")}
+        root = self.plan_hint["root"]
+        fanout = self.plan_hint["fanout"]
+        
+        try:
+            plan = self.plan(**inputs, lm=lm)
+        except Exception as err:
+            logger.warning(f"规划失败，回退到逐步ReAct循环: {_fmt_exc(err)}")
+            return None
+        
+        root_value = plan.get(root)
+        calls = _parse_tool_calls(plan.get("tool_calls"))
+        if not root_value or not calls:
+            logger.info("规划结果不完整，回退到逐步ReAct循环")
+            return None
+        for call in calls:
+            if not isinstance(call, dict) or call.get("tool_name") not in fanout:
+                logger.info(f"规划中包含规划之外的工具调用 {call}，回退到逐步ReAct循环")
+                return None
+            args = call.get("tool_args")
+            if not isinstance(args, dict) or self.tools[call["tool_name"]].required_args - args.keys():
+                logger.info(f"规划中的工具调用参数不完整 {call}，回退到逐步ReAct循环")
+                return None
+        
+        logger.info(f"规划确定{root}: {root_value}，并发调用 {[call['tool_name'] for call in calls]}")
+        # 本次运行中可缓存工具的观察结果
+        observation_cache = {}
+        trajectory = {
+            "thought_0": react_prompts["plan_thought"].format(root=root, value=root_value),
+            "tool_name_0": "parallel",
+            "tool_args_0": {"calls": calls},
+            "observation_0": self._run_parallel(calls, observation_cache),
+        }
+        
+        # 根据并发调用的观察结果整理其余输出
+        outputs = {root: root_value}
+        try:
+            extract = self._call_with_potential_trajectory_truncation(
+                self.extract, trajectory, lm=lm, **inputs
+            )
+            for field_name in self.signature.output_fields:
+                if field_name not in outputs:
+                    outputs[field_name] = extract.get(field_name) or f"无法生成{field_name}"
+        except Exception as err:
+            logger.error(f"提取结果时发生错误: {_fmt_exc(err)}")
+            for field_name in self.signature.output_fields:
+                outputs.setdefault(field_name, f"无法生成{field_name}，处理过程中出现错误")
+        return Prediction(trajectory=trajectory, **outputs)
+    
+    def _invoke_tool(self, tool: Tool, args: Dict[str, Any], observation_cache: Optional[Dict[Any, Any]] = None) -> Any:
+        """
+        调用工具，对声明了cache=True的工具复用相同参数的观察结果
+        
+        参数:
+            tool: 工具实例
+            args: 工具参数
+            observation_cache: 本次运行的观察结果缓存，为None时不使用缓存
+            
+        返回:
+            工具的返回值
+        """
+        if tool.func == self._run_parallel:
+            # parallel工具内的各个调用同样使用本次运行的观察结果缓存
+            return self._run_parallel(**tool.coerce_args(args), observation_cache=observation_cache)
+        if not tool.cache or observation_cache is None:
+            return tool(**args)
+        
+        key = _observation_key(tool, args)
+        if key is None:
+            # 参数中包含不可哈希的值，直接调用
+            return tool(**args)
+        
+        if key in observation_cache:
+            logger.info(f"复用工具 {tool.name} 的观察结果")
+            return observation_cache[key]
+        
+        observation = tool(**args)
+        observation_cache[key] = observation
+        return observation
+    
+    def _run_parallel(self, calls: List[Dict[str, Any]],
+                      observation_cache: Optional[Dict[Any, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        并发执行多个工具调用，parallel工具的实现
+        
+        工具多为同步函数且耗时主要在I/O上，因此在共享线程池中执行，总耗时取决于最慢的调用；
+        单个调用出错不影响其他调用。列表中出现finish时，finish及其后的调用都不执行。
+        
+        参数:
+            calls: 工具调用列表，每项为{"tool_name": 工具名称, "tool_args": 参数字典}
+            observation_cache: 本次运行的观察结果缓存，为None时不使用缓存
+            
+        返回:
+            与执行的调用顺序一致的结果列表，每项为{"tool_name": 工具名称, "observation": 观察结果}
+        """
+        if not isinstance(calls, list) or not calls:
+            raise ValueError("calls必须是非空的工具调用列表")
+        
+        # finish表示模型认为任务已经完成，之后的调用没有意义
+        for i, call in enumerate(calls):
+            if isinstance(call, dict) and call.get("tool_name") == "finish":
+                logger.info("并行调用中包含finish，忽略finish及其后的{}个调用", len(calls) - i - 1)
+                calls = calls[:i]
+                break
+        if not calls:
+            raise ValueError("finish不能通过parallel调用，请单独调用finish")
+        
+        def invoke(call: Any) -> Any:
+            if not isinstance(call, dict):
+                return f"执行错误: 无效的工具调用 {call}"
+            name = call.get("tool_name")
+            args = call.get("tool_args") or {}
+            # 模型给出的名称和参数可能是任意JSON值，校验失败只影响本次调用
+            if not isinstance(name, str) or name == "parallel" or name not in self.tools:
+                return f"执行错误: 无法并行调用工具 {name}"
+            if not isinstance(args, dict):
+                return f"执行错误: 工具 {name} 的参数必须是字典，实际为{type(args).__name__}: {args}"
+            tool = self.tools[name]
+            missing_args = tool.required_args - args.keys()
+            if missing_args:
+                return f"执行错误: 工具 {name} 缺少必要参数: {missing_args}"
+            try:
+                return self._invoke_tool(tool, args, observation_cache)
+            except Exception as err:
+                return f"执行错误 {name}: {_fmt_exc_short(err)}"
+        
+        if len(calls) == 1:
+            observations = [invoke(calls[0])]
+        else:
+            observations = list(_get_tool_executor().map(invoke, calls))
+        
+        return [
+            {"tool_name": call.get("tool_name") if isinstance(call, dict) else None, "observation": observation}
+            for call, observation in zip(calls, observations)
+        ]
+    
+    def _extract_outputs(self, trajectory: Dict[str, Any], lm: Any, input_args: Dict[str, Any],
+                         rendered_steps: Optional[Dict[str, Any]] = None) -> Prediction:
+        """
+        从最终轨迹中确定输出，轨迹中缺少的字段交给extract模块
+        
+        参数:
+            trajectory: 最终轨迹
+            lm: 语言模型实例
+            input_args: 输入参数
+            rendered_steps: 本次运行的渲染缓存
+            
+        返回:
+            包含轨迹和输出的预测结果，提取失败时输出为默认的错误说明
+        """
+        try:
+            # 首先检查轨迹中是否已经有结果字段
+            outputs = {}
+            for field_name in self.signature.output_fields:
+                if field_name in trajectory:
+                    outputs[field_name] = trajectory[field_name]
+            
+            # 如果所有必要的输出字段都已存在，直接返回结果
+            if all(field_name in outputs for field_name in self.signature.output_fields):
+                return Prediction(trajectory=trajectory, **outputs)
+            
+            # 否则，调用extract模块提取结果
+            extract = self._call_with_potential_trajectory_truncation(
+                self.extract, trajectory, lm=lm, rendered_steps=rendered_steps, **input_args
+            )
+            # 合并提取的结果和已有的结果
+            for field_name in self.signature.output_fields:
+                if field_name not in outputs and hasattr(extract, field_name):
+                    outputs[field_name] = getattr(extract, field_name)
+            # 返回包含轨迹和输出的预测结果
+            return Prediction(trajectory=trajectory, **outputs)
+        except Exception as err:
+            logger.error(f"提取结果时发生错误: {_fmt_exc(err)}")
+            # 如果提取失败，创建一个包含默认值的结果
+            default_outputs = {}
+            for field_name in self.signature.output_fields:
+                default_outputs[field_name] = f"无法生成{field_name}，处理过程中出现错误"
+            
+            return Prediction(trajectory=trajectory, **default_outputs)
+    
+    async def _aextract_outputs(self, trajectory: Dict[str, Any], lm: Any, input_args: Dict[str, Any],
+                                rendered_steps: Optional[Dict[str, Any]] = None) -> Prediction:
+        """_extract_outputs的异步版本"""
+        outputs = {name: trajectory[name] for name in self.signature.output_fields if name in trajectory}
+        if len(outputs) == len(self.signature.output_fields):
+            return Prediction(trajectory=trajectory, **outputs)
+        try:
+            extract = await self._acall_with_potential_trajectory_truncation(
+                self.extract, trajectory, lm=lm, rendered_steps=rendered_steps, **input_args
+            )
+            for field_name in self.signature.output_fields:
+                if field_name not in outputs and hasattr(extract, field_name):
+                    outputs[field_name] = getattr(extract, field_name)
+            return Prediction(trajectory=trajectory, **outputs)
+        except Exception as err:
+            logger.error(f"提取结果时发生错误: {_fmt_exc(err)}")
+            default_outputs = {
+                field_name: f"无法生成{field_name}，处理过程中出现错误"
+                for field_name in self.signature.output_fields
+            }
+            return Prediction(trajectory=trajectory, **default_outputs)
+    
+    def _is_repeated_step(self, trajectory: Dict[str, Any], idx: int, pred: Prediction) -> bool:
+        """
+        判断本步是否原样重复了上一步（思考、工具名称和参数都相同）
+        
+        参数:
+            trajectory: 当前轨迹字典
+            idx: 本步序号
+            pred: 本步的预测结果
+            
+        返回:
+            是否为重复步骤；选择finish工具时总是返回False
+        """
+        if idx == 0 or pred.next_tool_name == "finish":
+            return False
+        prev = idx - 1
+        return (
+            trajectory.get(f"thought_{prev}") == pred.next_thought
+            and trajectory.get(f"tool_name_{prev}") == pred.next_tool_name
+            and trajectory.get(f"tool_args_{prev}") == pred.next_tool_args
+        )
+    
+    def _fallback_tool_name(self, pred: Prediction):
+        """
+        重试后工具名称仍然无效时，改用忽略大小写完全匹配或最接近的工具，都没有时改用finish
+        
+        参数:
+            pred: 本步的预测结果，直接修改其next_tool_name（改用finish时同时清空参数）。
+                  Prediction没有定义__setattr__，属性赋值不会写入字典，这里直接写字典项
+        """
+        name = pred.next_tool_name or ""
+        # 如果有完全匹配的（忽略大小写），使用它；否则才计算相似度，匹配包含连字符的完整名称
+        exact_match = self._tool_names_by_lower.get(name.lower())
+        closest_match = None if exact_match else difflib.get_close_matches(name, self._tool_names, n=1)
+        
+        if exact_match:
+            logger.info(f"找到完全匹配的工具（忽略大小写）: {exact_match}")
+            pred["next_tool_name"] = exact_match
+        elif closest_match:
+            logger.info(f"使用最接近的工具: {closest_match[0]} (原始: {pred.next_tool_name})")
+            pred["next_tool_name"] = closest_match[0]
+        else:
+            logger.info("找不到接近的工具，使用finish工具")
+            pred["next_tool_name"] = "finish"
+            pred["next_tool_args"] = {}
+    
+    def _finish_outputs(self, trajectory: Dict[str, Any], idx: int, pred: Prediction) -> Dict[str, Any]:
+        """
+        模型选择finish工具时确定各输出字段的值
+        
+        优先使用finish的参数，没有参数时从轨迹和最后一个观察结果中获取，仍然缺少的字段填入提示信息。
+        
+        参数:
+            trajectory: 当前轨迹字典
+            idx: 本步序号
+            pred: 本步的预测结果
+        
+        返回:
+            输出字段字典
+        """
+        # 检查是否提供了输出字段参数
+        if pred.next_tool_args and len(pred.next_tool_args) > 0:
+            # 使用提供的参数作为输出
+            outputs = pred.next_tool_args
+            # 确保所有必要的输出字段都存在
+            for field_name in self.signature.output_fields:
+                if field_name not in outputs:
+                    outputs[field_name] = ""
+        else:
+            # 尝试从轨迹中提取结果
+            outputs = {}
+            
+            # 首先检查轨迹中是否已经有结果和解释
+            for field_name in self.signature.output_fields:
+                if field_name in trajectory:
+                    outputs[field_name] = trajectory[field_name]
+            
+            # 如果输出字段未完全填充，尝试从最后一个工具调用的observation中获取结果
+            if len(outputs) < len(self.signature.output_fields):
+                # 找到最后一个observation
+                last_obs = None
+                
+                for i in range(idx-1, -1, -1):
+                    if f"observation_{i}" in trajectory:
+                        last_obs = trajectory[f"observation_{i}"]
+                        break
+                
+                # 如果有最后一个观察结果且输出字段只有一个，直接使用观察结果
+                if last_obs is not None and len(self.signature.output_fields) == 1:
+                    field_name = next(iter(self.signature.output_fields))
+                    if field_name not in outputs:
+                        try:
+                            # 尝试转换为数值(如果是计算任务)，否则保持原样
+                            try:
+                                outputs[field_name] = float(last_obs)
+                            except (ValueError, TypeError):
+                                outputs[field_name] = last_obs
+                            logger.info(f"从最后一个观察中获取'{field_name}'：{outputs[field_name]}")
+                        except Exception as e:
+                            logger.error(f"处理最后一个观察时出错：{e}")
+        
+        # 确保所有必要的输出字段都存在
+        for field_name in self.signature.output_fields:
+            if field_name not in outputs:
+                outputs[field_name] = f"无法生成{field_name}"
+        
+        return outputs
+    
+    def _compress_trajectory(self, trajectory: Dict[str, Any], lm: Any = None,
+                             rendered_steps: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        轨迹估算的token数超出预算时，将较早的步骤总结为一段摘要，最近的keep_recent_steps步保留原文
+        
+        参数:
+            trajectory: 当前轨迹字典
+            lm: 语言模型实例，为None时使用全局配置
+            rendered_steps: 本次运行的渲染缓存
+            
+        返回:
+            未超出预算时返回原轨迹，否则返回{"summary": 摘要, **最近步骤}形式的新轨迹
+        """
+        budget = self.trajectory_token_budget
+        if not budget or sum(_estimate_tokens(value) for value in trajectory.values()) <= budget:
+            return trajectory
+        
+        steps = sorted({step for step in map(_step_of, trajectory) if step is not None})
+        if len(steps) <= self.keep_recent_steps:
+            return trajectory
+        
+        recent_steps = set(steps[-self.keep_recent_steps:])
+        older = {k: v for k, v in trajectory.items() if _step_of(k) not in recent_steps}
+        recent = {k: v for k, v in trajectory.items() if _step_of(k) in recent_steps}
+        
+        messages = [
+            {"role": "system", "content": react_prompts["summarize_trajectory"]},
+            {"role": "user", "content": self._format_trajectory(older, rendered_steps)},
+        ]
+        try:
+            response = lm.chat(messages, temperature=0.1) if lm else lm_chat(messages, temperature=0.1)
+            summary = None if "error" in response else response.get("content")
+        except Exception as err:
+            logger.warning(f"总结轨迹失败: {_fmt_exc_short(err)}")
+            summary = None
+        if not summary:
+            # 总结失败时直接丢弃较早的步骤
+            summary = f"（已省略较早的{len(steps) - len(recent_steps)}步推理）"
+        
+        logger.info(f"轨迹超出token预算{budget}，已将{len(steps) - len(recent_steps)}个较早的步骤总结为摘要")
+        return {"summary": summary, **recent}
     
-    def _format_trajectory(self, trajectory: Dict[str, Any]) -> str:
+    def _format_trajectory(self, trajectory: Dict[str, Any],
+                           rendered_steps: Optional[Dict[str, Any]] = None) -> str:
         """
         格式化轨迹信息，确保格式清晰
         
         参数:
             trajectory: 轨迹字典
+            rendered_steps: 本次运行的渲染缓存，{键: (值, 渲染后的行)}，为None时不复用
             
         返回:
-            格式化后的轨迹字符串
+            格式化后的轨迹字符串，轨迹为空（第一轮）时返回空字符串
         """
-        # 创建一个临时的聊天适配器和签名
-        from .predict import ChatAdapter
-        adapter = ChatAdapter()
+        if not trajectory:
+            return ""
         
-        # 处理特殊的错误反馈字段
+        # 一次遍历分出错误反馈字段，常规字段直接渲染。轨迹每轮只新增几个条目，已有条目的值不会改变，
+        # 按值的身份复用上一轮的渲染结果，避免每轮重新序列化全部观察结果
+        rendered = rendered_steps if rendered_steps is not None else {}
+        keys = []
+        lines = []
         error_feedbacks = {}
-        normal_fields = {}
-        
         for key, value in trajectory.items():
             if key.startswith("error_feedback_"):
                 error_feedbacks[key] = value
-            else:
-                normal_fields[key] = value
-        
-        # 首先格式化常规字段
-        trajectory_signature = Signature({}, {}, f"{', '.join(normal_fields.keys())} -> x")
-        formatted_trajectory = adapter.format_user_message_content(trajectory_signature, normal_fields)
+                continue
+            cached = rendered.get(key)
+            if cached is None or cached[0] is not value:
+                cached = rendered[key] = (value, f"{key}: {_format_value(value)}")
+            keys.append(key)
+            lines.append(cached[1])
         
-        # 然后添加错误反馈（如果有的话）
+        # 各部分只拼接一次，错误反馈（如果有的话）放在最后
+        parts = [_trajectory_header(tuple(keys)), *lines]
         if error_feedbacks:
-            feedback_parts = []
-            for key in sorted(error_feedbacks.keys()):
-                feedback_parts.append(error_feedbacks[key])
-            
-            formatted_trajectory += "\n\n" + "\n".join(feedback_parts)
+            parts[-1] += "\n"
+            parts.extend(error_feedbacks[key] for key in sorted(error_feedbacks))
+        formatted_trajectory = "\n".join(parts)
         
         return formatted_trajectory
     
@@ -132,42 +597,157 @@ class ReAct(Module):
         """
         执行ReAct推理过程
         
+        启用响应缓存（见enable_response_cache）时，相同的输入直接返回缓存的结果。
+        
         参数:
             **input_args: 输入参数
             
         返回:
             包含轨迹和输出的预测结果
         """
+        cache = get_response_cache()
+        if cache is None:
+            return self._forward(**input_args)
+        
+        cache_key = self._response_cache_key(input_args)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info("使用缓存的ReAct结果")
+            return _copy_prediction(cached)
+        
+        result = self._forward(**input_args)
+        if self._is_cacheable(result):
+            cache.set(cache_key, _copy_prediction(result))
+        return result
+    
+    async def aforward(self, **input_args: Any) -> Prediction:
+        """
+        forward的异步版本
+        
+        LLM调用通过事件循环共享的异步HTTP客户端进行，工具通过Tool.acall调用（同步工具在线程池中执行），
+        等待LLM响应时不占用线程，多个智能体可以在同一个事件循环中并发运行，例如
+        asyncio.gather(*(agent.aforward(**inputs) for inputs in batch))。
+        
+        参数:
+            **input_args: 输入参数
+            
+        返回:
+            包含轨迹和输出的预测结果
+        """
+        cache = get_response_cache()
+        if cache is None:
+            return await self._aforward(**input_args)
+        
+        cache_key = self._response_cache_key(input_args)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info("使用缓存的ReAct结果")
+            return _copy_prediction(cached)
+        
+        result = await self._aforward(**input_args)
+        if self._is_cacheable(result):
+            cache.set(cache_key, _copy_prediction(result))
+        return result
+    
+    async def abatch(self, inputs: List[Dict[str, Any]], concurrency: Optional[int] = 16) -> List[Prediction]:
+        """
+        并发运行多组输入
+        
+        与Module.abatch不同，每组输入是事件循环中的一个aforward协程，共用异步HTTP客户端，不为每次运行占用线程。
+        
+        参数:
+            inputs: 输入参数字典列表
+            concurrency: 最大并发数，为None时不限制
+            
+        返回:
+            与inputs顺序一致的预测结果列表
+        """
+        semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+        
+        async def run(kwargs: Dict[str, Any]) -> Prediction:
+            if semaphore is None:
+                return await self.aforward(**kwargs)
+            async with semaphore:
+                return await self.aforward(**kwargs)
+        
+        return await asyncio.gather(*(run(dict(kwargs)) for kwargs in inputs))
+    
+    def _is_cacheable(self, result: Prediction) -> bool:
+        """处理出错时的兜底结果不缓存，以便下次重新执行"""
+        return not any(isinstance(result.get(name), str) and result[name].startswith("无法生成")
+                       for name in self.signature.output_fields)
+    
+    def _response_cache_key(self, input_args: Dict[str, Any]) -> str:
+        """
+        生成响应缓存键，由签名、工具、模型和输入共同决定
+        
+        参数:
+            input_args: 调用forward时的参数
+            
+        返回:
+            缓存键
+        """
+        lm = input_args.get("lm", self.lm)
+        model_id = f"{lm.model_name}@{lm.api_base or ''}" if lm else lm_config.get_model()
+        inputs = {k: v for k, v in input_args.items() if k in self.signature.input_fields}
+        return ResponseCache.make_key(
+            self.signature.cache_key,
+            sorted(self.tools),
+            model_id,
+            input_args.get("max_iters", self.max_iters),
+            inputs,
+        )
+    
+    def _forward(self, **input_args: Any) -> Prediction:
+        """
+        执行ReAct推理循环，不经过响应缓存
+        
+        参数:
+            **input_args: 输入参数
+            
+        返回:
+            包含轨迹和输出的预测结果
+        """
+        # 规划模式下先尝试一次规划、并发执行工具
+        if self.plan is not None:
+            result = self._forward_dag(input_args)
+            if result is not None:
+                return result
+        
         # 创建轨迹字典，用于存储推理过程
         trajectory = {}
+        # 本次运行中可缓存工具的观察结果
+        observation_cache = {}
+        # 本次运行中轨迹各条目的渲染结果，{键: (值, 渲染后的行)}
+        rendered_steps = {}
         
         # 获取最大迭代次数，可在调用时覆盖默认值
         max_iters = input_args.pop("max_iters", self.max_iters)
 
         lm = input_args.pop("lm", self.lm)
         
+        # 只有finish工具时推理循环必然在第一轮结束，直接从输入中提取结果，省去一次react调用
+        if max_iters <= 0 or len(self.tools) == 1:
+            return self._extract_outputs(trajectory, lm, input_args, rendered_steps)
+        
         # 迭代执行推理-行动-观察循环
         for idx in range(max_iters):
             try:
+                # 轨迹超出token预算时先总结较早的步骤
+                trajectory = self._compress_trajectory(trajectory, lm, rendered_steps)
                 # 调用react预测模块进行下一步预测
                 pred = self._call_with_potential_trajectory_truncation(
-                    self.react, trajectory,lm=lm, **input_args
+                    self.react, trajectory, lm=lm, rendered_steps=rendered_steps, **input_args
                 )
                 
-                # 确保pred包含所需的属性
-                if not hasattr(pred, "next_thought") or not hasattr(pred, "next_tool_name") or not hasattr(pred, "next_tool_args"):
-                    logger.error("预测结果缺少必要属性，无法继续执行")
-                    break
-                
                 # 添加调试信息
                 logger.info(f"思考: {pred.next_thought}")
                 logger.info(f"选择工具: {pred.next_tool_name}")
                 logger.info(f"工具参数: {pred.next_tool_args}")
                 
                 # 验证工具名称是否有效
-                if pred.next_tool_name not in self.tools:
-                    available_tools = list(self.tools.keys())
-                    logger.error(f"工具名称'{pred.next_tool_name}'无效。可用工具: {available_tools}")
+                if pred.next_tool_name not in self._tool_name_set:
+                    logger.error("工具名称'{}'无效。可用工具: {}", pred.next_tool_name, self._tool_names)
                     
                     # 最多重试3次
                     max_retries = 3
@@ -176,11 +756,11 @@ class ReAct(Module):
                     while retry_attempt <= max_retries:
                         # 尝试重新预测
                         retry_pred = self._retry_prediction(
-                            self.react, trajectory, retry_attempt, input_args, lm
+                            self.react, trajectory, retry_attempt, input_args, lm, rendered_steps
                         )
                         
                         # 检查新的预测结果是否有效
-                        if hasattr(retry_pred, "next_tool_name") and retry_pred.next_tool_name in self.tools:
+                        if retry_pred.next_tool_name in self._tool_name_set:
                             logger.info(f"重试成功：获得有效的工具名称 {retry_pred.next_tool_name}")
                             pred = retry_pred  # 使用新的有效预测结果
                             break
@@ -188,149 +768,196 @@ class ReAct(Module):
                         retry_attempt += 1
                     
                     # 如果所有重试都失败，才回退到最接近匹配或finish工具
-                    if pred.next_tool_name not in self.tools:
-                        import difflib
-                        # 改进匹配逻辑：优先匹配包含连字符的完整名称
-                        closest_match = difflib.get_close_matches(pred.next_tool_name, available_tools, n=3)
-                        
-                        # 如果有完全匹配的（忽略大小写），使用它
-                        exact_match = None
-                        for tool in available_tools:
-                            if tool.lower() == pred.next_tool_name.lower():
-                                exact_match = tool
-                                break
-                        
-                        if exact_match:
-                            logger.info(f"找到完全匹配的工具（忽略大小写）: {exact_match}")
-                            pred.next_tool_name = exact_match
-                        elif closest_match:
-                            logger.info(f"使用最接近的工具: {closest_match[0]} (原始: {pred.next_tool_name})")
-                            pred.next_tool_name = closest_match[0]
-                        else:
-                            logger.info("找不到接近的工具，使用finish工具")
-                            pred.next_tool_name = "finish"
-                            pred.next_tool_args = {}
+                    if pred.next_tool_name not in self._tool_name_set:
+                        self._fallback_tool_name(pred)
             except ValueError as err:
-                logger.warning(f"结束轨迹: 智能体未能选择有效工具: {_fmt_exc(err)}")
+                logger.warning(f"结束轨迹: 智能体未能选择有效工具: {_fmt_exc_short(err)}")
                 break
             except Exception as err:
                 logger.error(f"预测过程中发生错误: {_fmt_exc(err)}")
                 break
             
-            # 记录思考、工具名称和参数
-            trajectory[f"thought_{idx}"] = pred.next_thought
-            trajectory[f"tool_name_{idx}"] = pred.next_tool_name
-            trajectory[f"tool_args_{idx}"] = pred.next_tool_args
+            # 原样重复上一步说明智能体在原地打转，继续迭代不会得到新信息，直接提取结果
+            if self._is_repeated_step(trajectory, idx, pred):
+                logger.info("智能体重复了上一步的思考和工具调用，提前结束推理循环")
+                break
+            
+            # 记录思考、工具名称和参数。Prediction缺少字段时返回None，这里一次取出，本轮其余部分只用局部变量
+            thought, tool_name, tool_args = pred.next_thought, pred.next_tool_name, pred.next_tool_args
+            trajectory[f"thought_{idx}"] = thought
+            trajectory[f"tool_name_{idx}"] = tool_name
+            trajectory[f"tool_args_{idx}"] = tool_args
             
             try:
                 # 调用选定的工具并记录结果
-                tool = self.tools[pred.next_tool_name]
-                # 验证工具参数
-                required_args = set(getattr(tool, "args", {}).keys())
-                provided_args = set(pred.next_tool_args.keys())
-                missing_args = required_args - provided_args
+                tool = self.tools[tool_name]
+                # 验证工具参数，只检查没有默认值的必需参数
+                missing_args = tool.required_args - tool_args.keys()
                 
-                if missing_args and pred.next_tool_name != "finish":
+                if missing_args and tool_name != "finish":
                     # 如果缺少必要参数，记录错误并继续
-                    error_msg = f"工具 {pred.next_tool_name} 缺少必要参数: {missing_args}"
+                    error_msg = f"工具 {tool_name} 缺少必要参数: {missing_args}"
                     logger.error(error_msg)
                     trajectory[f"observation_{idx}"] = f"执行错误: {error_msg}"
                 else:
                     # 调用工具
-                    trajectory[f"observation_{idx}"] = tool(**pred.next_tool_args)
+                    trajectory[f"observation_{idx}"] = self._invoke_tool(tool, tool_args, observation_cache)
             except Exception as err:
                 # 记录工具执行错误
-                trajectory[f"observation_{idx}"] = f"执行错误 {pred.next_tool_name}: {_fmt_exc(err)}"
-            
-            # 如果选择了finish工具，表示推理完成
-            if pred.next_tool_name == "finish":
-                # 检查是否提供了输出字段参数
-                if pred.next_tool_args and len(pred.next_tool_args) > 0:
-                    # 使用提供的参数作为输出
-                    outputs = pred.next_tool_args
-                    # 确保所有必要的输出字段都存在
-                    for field_name in self.signature.output_fields:
-                        if field_name not in outputs:
-                            outputs[field_name] = ""
-                else:
-                    # 尝试从轨迹中提取结果
-                    outputs = {}
-                    
-                    # 首先检查轨迹中是否已经有结果和解释
-                    for field_name in self.signature.output_fields:
-                        if field_name in trajectory:
-                            outputs[field_name] = trajectory[field_name]
-                    
-                    # 如果输出字段未完全填充，尝试从最后一个工具调用的observation中获取结果
-                    if len(outputs) < len(self.signature.output_fields):
-                        # 找到最后一个observation
-                        last_obs_idx = -1
-                        last_obs = None
-                        
-                        for i in range(idx-1, -1, -1):
-                            if f"observation_{i}" in trajectory:
-                                last_obs = trajectory[f"observation_{i}"]
-                                last_obs_idx = i
-                                last_tool = trajectory.get(f"tool_name_{i}", "")
-                                break
-                        
-                        # 如果有最后一个观察结果且输出字段只有一个，直接使用观察结果
-                        if last_obs is not None and len(self.signature.output_fields) == 1:
-                            field_name = next(iter(self.signature.output_fields))
-                            if field_name not in outputs:
-                                try:
-                                    # 尝试转换为数值(如果是计算任务)，否则保持原样
-                                    try:
-                                        outputs[field_name] = float(last_obs)
-                                    except (ValueError, TypeError):
-                                        outputs[field_name] = last_obs
-                                    logger.info(f"从最后一个观察中获取'{field_name}'：{outputs[field_name]}")
-                                except Exception as e:
-                                    logger.error(f"处理最后一个观察时出错：{e}")
-                
-                # 确保所有必要的输出字段都存在
-                for field_name in self.signature.output_fields:
-                    if field_name not in outputs:
-                        outputs[field_name] = f"无法生成{field_name}"
-                
-                # 将输出添加到轨迹中
-                for field_name, value in outputs.items():
-                    trajectory[field_name] = value
-                
+                trajectory[f"observation_{idx}"] = f"执行错误 {tool_name}: {_fmt_exc_short(err)}"
+            
+            # 如果选择了finish工具，表示推理完成，将输出添加到轨迹中
+            if tool_name == "finish":
+                trajectory.update(self._finish_outputs(trajectory, idx, pred))
                 break
         
-        # 从最终轨迹中提取结果
-        try:
-            # 首先检查轨迹中是否已经有结果字段
-            outputs = {}
-            for field_name in self.signature.output_fields:
-                if field_name in trajectory:
-                    outputs[field_name] = trajectory[field_name]
+        return self._extract_outputs(trajectory, lm, input_args, rendered_steps)
+    
+    async def _aforward(self, **input_args: Any) -> Prediction:
+        """
+        _forward的异步版本，不经过响应缓存
+        
+        参数:
+            **input_args: 输入参数
             
-            # 如果所有必要的输出字段都已存在，直接返回结果
-            if all(field_name in outputs for field_name in self.signature.output_fields):
-                return Prediction(trajectory=trajectory, **outputs)
+        返回:
+            包含轨迹和输出的预测结果
+        """
+        # 规划模式的工具调用本身已经并发执行，整个规划过程放到线程池中
+        if self.plan is not None:
+            result = await asyncio.to_thread(self._forward_dag, input_args)
+            if result is not None:
+                return result
+        
+        trajectory = {}
+        observation_cache = {}
+        # 本次运行中轨迹各条目的渲染结果，{键: (值, 渲染后的行)}
+        rendered_steps = {}
+        max_iters = input_args.pop("max_iters", self.max_iters)
+        lm = input_args.pop("lm", self.lm)
+        
+        if max_iters <= 0 or len(self.tools) == 1:
+            return await self._aextract_outputs(trajectory, lm, input_args, rendered_steps)
+        
+        for idx in range(max_iters):
+            try:
+                # 总结轨迹需要一次同步的LLM调用，只在设置了预算时才进入线程池
+                if self.trajectory_token_budget:
+                    trajectory = await asyncio.to_thread(self._compress_trajectory, trajectory, lm, rendered_steps)
+                pred = await self._acall_with_potential_trajectory_truncation(
+                    self.react, trajectory, lm=lm, rendered_steps=rendered_steps, **input_args
+                )
+                logger.info("思考: {} | 选择工具: {} | 工具参数: {}",
+                            pred.next_thought, pred.next_tool_name, pred.next_tool_args)
+                
+                # 工具名称无效时最多重试3次，仍然无效时使用最接近的工具
+                if pred.next_tool_name not in self._tool_name_set:
+                    logger.error("工具名称'{}'无效。可用工具: {}", pred.next_tool_name, self._tool_names)
+                    for attempt in range(1, 4):
+                        retry_trajectory = dict(trajectory)
+                        retry_trajectory[f"error_feedback_{attempt}"] = _RETRY_FEEDBACK
+                        logger.info("尝试重新预测 (第{}次尝试)", attempt)
+                        retry_pred = await self.react.aforward(
+                            **input_args, trajectory=self._format_trajectory(retry_trajectory, rendered_steps), lm=lm
+                        )
+                        if retry_pred.next_tool_name in self._tool_name_set:
+                            pred = retry_pred
+                            break
+                    if pred.next_tool_name not in self._tool_name_set:
+                        self._fallback_tool_name(pred)
+            except Exception as err:
+                logger.error(f"预测过程中发生错误: {_fmt_exc(err)}")
+                break
             
-            # 否则，调用extract模块提取结果
-            extract = self._call_with_potential_trajectory_truncation(
-                self.extract, trajectory, lm=lm, **input_args
-            )
-            # 合并提取的结果和已有的结果
-            for field_name in self.signature.output_fields:
-                if field_name not in outputs and hasattr(extract, field_name):
-                    outputs[field_name] = getattr(extract, field_name)
-            # 返回包含轨迹和输出的预测结果
-            return Prediction(trajectory=trajectory, **outputs)
-        except Exception as err:
-            logger.error(f"提取结果时发生错误: {_fmt_exc(err)}")
-            # 如果提取失败，创建一个包含默认值的结果
-            default_outputs = {}
-            for field_name in self.signature.output_fields:
-                default_outputs[field_name] = f"无法生成{field_name}，处理过程中出现错误"
+            if self._is_repeated_step(trajectory, idx, pred):
+                logger.info("智能体重复了上一步的思考和工具调用，提前结束推理循环")
+                break
             
-            return Prediction(trajectory=trajectory, **default_outputs)
+            thought, tool_name, tool_args = pred.next_thought, pred.next_tool_name, pred.next_tool_args
+            trajectory[f"thought_{idx}"] = thought
+            trajectory[f"tool_name_{idx}"] = tool_name
+            trajectory[f"tool_args_{idx}"] = tool_args
+            
+            try:
+                tool = self.tools[tool_name]
+                missing_args = tool.required_args - tool_args.keys()
+                if missing_args and tool_name != "finish":
+                    error_msg = f"工具 {tool_name} 缺少必要参数: {missing_args}"
+                    logger.error(error_msg)
+                    trajectory[f"observation_{idx}"] = f"执行错误: {error_msg}"
+                else:
+                    trajectory[f"observation_{idx}"] = await self._ainvoke_tool(tool, tool_args, observation_cache)
+            except Exception as err:
+                trajectory[f"observation_{idx}"] = f"执行错误 {tool_name}: {_fmt_exc_short(err)}"
+            
+            if tool_name == "finish":
+                trajectory.update(self._finish_outputs(trajectory, idx, pred))
+                break
+        
+        return await self._aextract_outputs(trajectory, lm, input_args, rendered_steps)
     
-    def _call_with_potential_trajectory_truncation(self, module, trajectory, lm=None, **input_args):
+    async def _ainvoke_tool(self, tool: Tool, args: Dict[str, Any],
+                            observation_cache: Optional[Dict[Any, Any]] = None) -> Any:
+        """
+        _invoke_tool的异步版本，异步工具直接在事件循环中等待，同步工具在线程池中执行
+        
+        参数:
+            tool: 工具实例
+            args: 工具参数
+            observation_cache: 本次运行的观察结果缓存，为None时不使用缓存
+            
+        返回:
+            工具的返回值
+        """
+        if tool.func == self._run_parallel:
+            return await asyncio.to_thread(self._invoke_tool, tool, args, observation_cache)
+        
+        key = _observation_key(tool, args) if tool.cache and observation_cache is not None else None
+        if key is not None and key in observation_cache:
+            logger.info(f"复用工具 {tool.name} 的观察结果")
+            return observation_cache[key]
+        
+        observation = await tool.acall(**args)
+        if key is not None:
+            observation_cache[key] = observation
+        return observation
+    
+    async def _acall_with_potential_trajectory_truncation(self, module, trajectory, lm=None, rendered_steps=None,
+                                                          **input_args):
+        """
+        _call_with_potential_trajectory_truncation的异步版本，通过module.aforward调用
+        
+        参数:
+            module: 要调用的模块（Predict或其子类）
+            trajectory: 当前轨迹
+            lm: 语言模型实例
+            **input_args: 输入参数
+            
+        返回:
+            模块调用结果；多次失败时返回选择finish工具的预测结果
+        """
+        formatted = None
+        for attempt in range(3):
+            try:
+                if formatted is None:
+                    formatted = self._format_trajectory(trajectory, rendered_steps)
+                return await module.aforward(**input_args, trajectory=formatted, lm=lm)
+            except ContextWindowExceededError:
+                logger.warning("轨迹超出上下文窗口限制，截断最早的工具调用信息。")
+                try:
+                    trajectory = self._truncate_for_retry(trajectory, rendered_steps)
+                    formatted = None
+                except ValueError as e:
+                    logger.error(f"无法截断轨迹: {e}")
+                    return _failure_prediction("truncate_failed")
+            except Exception as e:
+                # 只在最后一次尝试失败时记录完整的堆栈
+                logger.error(f"调用模块时发生错误: {_fmt_exc(e) if attempt == 2 else _fmt_exc_short(e)}")
+        
+        return _failure_prediction("retries_exhausted")
+    
+    def _call_with_potential_trajectory_truncation(self, module, trajectory, lm=None, rendered_steps=None,
+                                                   **input_args):
         """
         调用模块，当轨迹过长时进行截断处理
         
@@ -343,76 +970,89 @@ class ReAct(Module):
         返回:
             模块调用结果
         """
-        # 尝试最多3次，如果遇到上下文长度超出，则截断轨迹
+        # 尝试最多3次，如果遇到上下文长度超出，则截断轨迹。
+        # 轨迹只在截断后才需要重新格式化，其他错误的重试直接复用上一次的格式化结果
+        formatted = None
         for attempt in range(3):
             try:
-                logger.debug(f"_call_with_potential_trajectory_truncation attempt {attempt}: calling module {module}")
-                logger.debug(f"传递的参数: lm={lm.model_name if lm else 'None'}")
-                print(f"[REACT DEBUG] 即将调用模块: {module.__class__.__name__}")
-                print(f"[REACT DEBUG] 模块类型: {type(module)}")
-                print(f"[REACT DEBUG] 模块有forward方法: {hasattr(module, 'forward')}")
-                print(f"[REACT DEBUG] 传递的轨迹: {self._format_trajectory(trajectory)}")
+                if formatted is None:
+                    formatted = self._format_trajectory(trajectory, rendered_steps)
+                # 调试输出会把完整的轨迹文本再复制一份并写到标准输出，只在调试模式下执行
+                debug = lm_config.is_debug_enabled()
+                logger.debug("_call_with_potential_trajectory_truncation attempt {}: calling module {}", attempt, module)
+                logger.debug("传递的参数: lm={}", lm.model_name if lm else 'None')
+                if debug:
+                    print(f"[REACT DEBUG] 即将调用模块: {module.__class__.__name__}")
+                    print(f"[REACT DEBUG] 模块类型: {type(module)}")
+                    print(f"[REACT DEBUG] 模块有forward方法: {hasattr(module, 'forward')}")
+                    print(f"[REACT DEBUG] 传递的轨迹: {formatted}")
                 
                 result = module(
                     **input_args,
-                    trajectory=self._format_trajectory(trajectory),
+                    trajectory=formatted,
                     lm=lm,
                 )
-                print(f"[REACT DEBUG] 模块调用返回结果: {result}")
-                print(f"[REACT DEBUG] 结果类型: {type(result)}")
-                print(f"[REACT DEBUG] 结果内容: {dict(result) if hasattr(result, 'items') else str(result)}")
+                if debug:
+                    print(f"[REACT DEBUG] 模块调用返回结果: {result}")
+                    print(f"[REACT DEBUG] 结果类型: {type(result)}")
+                    print(f"[REACT DEBUG] 结果内容: {dict(result) if hasattr(result, 'items') else str(result)}")
                 
-                logger.debug(f"模块调用成功返回: {type(result)}")
+                logger.debug("模块调用成功返回: {}", type(result))
                 return result
             except ContextWindowExceededError:
                 logger.warning("轨迹超出上下文窗口限制，截断最早的工具调用信息。")
                 try:
-                    trajectory = self.truncate_trajectory(trajectory)
+                    trajectory = self._truncate_for_retry(trajectory, rendered_steps)
+                    formatted = None
                 except ValueError as e:
                     logger.error(f"无法截断轨迹: {e}")
-                    # 返回一个错误的Prediction对象
-                    from .predict import Prediction
-                    return Prediction(
-                        next_thought="无法截断轨迹，任务结束", 
-                        next_tool_name="finish",
-                        next_tool_args={"reasoning": "轨迹过长且无法截断", "answer": "抱歉，请求过于复杂，请简化后重试。"}
-                    )
+                    return _failure_prediction("truncate_failed")
             except Exception as e:
-                logger.error(f"调用模块时发生错误: {e}")
-                import traceback
-                logger.error(f"完整异常信息: {traceback.format_exc()}")
+                logger.error(f"调用模块时发生错误: {_fmt_exc_short(e)}")
+                # 只在最后一次尝试失败时记录完整的堆栈
+                if attempt == 2:
+                    logger.error(f"完整异常信息: {traceback.format_exc()}")
                 # 检查是否是超时相关错误，如果是则尝试截断轨迹
                 error_msg = str(e).lower()
                 if any(keyword in error_msg for keyword in ['timeout', 'timed out', 'time out', '超时', '请求超时']):
                     logger.warning(f"检测到超时错误，可能是轨迹过长，尝试截断: {e}")
                     try:
-                        trajectory = self.truncate_trajectory(trajectory)
+                        trajectory = self._truncate_for_retry(trajectory, rendered_steps)
+                        formatted = None
                         continue  # 重试
                     except ValueError as truncate_e:
                         logger.error(f"超时且无法截断轨迹: {truncate_e}")
-                        from .predict import Prediction
-                        return Prediction(
-                            next_thought="处理超时且无法截断", 
-                            next_tool_name="finish",
-                            next_tool_args={"reasoning": "请求处理超时", "answer": "抱歉，请求处理时间过长，请稍后重试。"}
-                        )
+                        return _failure_prediction("timeout")
                 
                 # 如果是最后一次尝试，返回一个错误的Prediction对象
                 if attempt == 2:  # 最后一次尝试
-                    from .predict import Prediction
-                    return Prediction(
-                        next_thought="处理出错，任务结束", 
-                        next_tool_name="finish",
-                        next_tool_args={"reasoning": "系统处理出错", "answer": "抱歉，系统遇到错误，请稍后重试。"}
-                    )
+                    return _failure_prediction("error")
         
         # 如果所有尝试都失败，返回一个错误的Prediction对象
-        from .predict import Prediction
-        return Prediction(
-            next_thought="所有重试都失败，任务结束", 
-            next_tool_name="finish",
-            next_tool_args={"reasoning": "系统多次重试失败", "answer": "抱歉，系统遇到错误，请稍后重试。"}
-        )
+        return _failure_prediction("retries_exhausted")
+    
+    def _truncate_for_retry(self, trajectory: Dict[str, Any],
+                            rendered_steps: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        调用truncate_trajectory截断轨迹，并清空本次运行的渲染缓存
+        
+        truncate_trajectory（包括用户重写的版本）可能原地压缩观察结果，值的身份不变，
+        渲染缓存无法察觉，因此截断后整体重新渲染。截断只在超出上下文时发生，代价可以忽略
+        
+        参数:
+            trajectory: 当前轨迹
+            rendered_steps: 本次运行的渲染缓存
+            
+        返回:
+            截断后的轨迹
+        
+        异常:
+            ValueError: 轨迹无法截断
+        """
+        trajectory = self.truncate_trajectory(trajectory)
+        if rendered_steps is not None:
+            rendered_steps.clear()
+        return trajectory
     
     def truncate_trajectory(self, trajectory: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -426,19 +1066,16 @@ class ReAct(Module):
         返回:
             截断后的轨迹字典
         """
-        keys = list(trajectory.keys())
-        
-        # 计算轨迹中的工具调用次数
+        # 计算轨迹中的工具调用，步骤序号按整数比较，超过10步时也能找到最早的一步
         tool_calls = set()
-        for key in keys:
+        for key, value in trajectory.items():
             if key.startswith("thought_"):
-                idx = key.split("_")[1]
-                tool_calls.add(idx)
-        
-        # 首先尝试压缩大的观察结果（如HTML表格）
-        for key in keys:
-            if key.startswith("observation_") and isinstance(trajectory[key], dict):
-                obs = trajectory[key]
+                step = _step_of(key)
+                if step is not None:
+                    tool_calls.add(step)
+            # 首先尝试压缩大的观察结果（如HTML表格）
+            elif key.startswith("observation_") and isinstance(value, dict):
+                obs = value
                 if 'result_data' in obs and isinstance(obs['result_data'], dict):
                     result_data = obs['result_data']
                     # 压缩HTML表格数据
@@ -457,18 +1094,15 @@ class ReAct(Module):
             logger.info("只有一个工具调用，已压缩观察结果内容")
             return trajectory
         
-        # 保留最近的工具调用，删除最早的一个
+        # 保留最近的工具调用，删除最早的一个。每一步固定只有这四个键，直接删除
         earliest_idx = min(tool_calls)
-        keys_to_remove = [k for k in keys if k.endswith(f"_{earliest_idx}")]
-        
-        # 删除最早的工具调用相关的键
-        for key in keys_to_remove:
-            trajectory.pop(key)
+        for name in _STEP_FIELDS:
+            trajectory.pop(f"{name}_{earliest_idx}", None)
         
         logger.info(f"已截断轨迹，删除了工具调用 {earliest_idx}")
         return trajectory
 
-    def _retry_prediction(self, react_predictor, trajectory, attempt, input_args, lm=None):
+    def _retry_prediction(self, react_predictor, trajectory, attempt, input_args, lm=None, rendered_steps=None):
         """
         当检测到格式问题时，尝试重新发起预测
         
@@ -478,6 +1112,7 @@ class ReAct(Module):
             attempt: 当前尝试次数
             input_args: 输入参数
             lm: 语言模型
+            rendered_steps: 本次运行的渲染缓存
             
         返回:
             重新预测的结果
@@ -486,7 +1121,19 @@ class ReAct(Module):
         retry_trajectory = dict(trajectory)
         
         # 添加错误反馈到轨迹中
-        retry_trajectory[f"error_feedback_{attempt}"] = """
+        retry_trajectory[f"error_feedback_{attempt}"] = _RETRY_FEEDBACK
+        
+        # 重新调用预测
+        logger.info(f"尝试重新预测 (第{attempt}次尝试)")
+        return react_predictor(
+            **input_args,
+            trajectory=self._format_trajectory(retry_trajectory, rendered_steps),
+            lm=lm
+        )
+
+
+# 工具名称无效时重新预测所附带的格式说明
+_RETRY_FEEDBACK = """
 错误：您的输出格式不正确。请严格按照以下格式输出：
 
 next_thought: 您的思考过程（只在这一行）
@@ -497,14 +1144,161 @@ next_tool_args: {"参数名": "参数值"}
 
 请注意每个字段必须单独成行，不要混合字段内容。
 """
+
+
+# 调用模块多次失败时交给finish工具的兜底预测，{类型: (思考, 工具参数)}
+_FAILURE_PREDICTIONS = {
+    "truncate_failed": ("无法截断轨迹，任务结束",
+                        {"reasoning": "轨迹过长且无法截断", "answer": "抱歉，请求过于复杂，请简化后重试。"}),
+    "timeout": ("处理超时且无法截断",
+                {"reasoning": "请求处理超时", "answer": "抱歉，请求处理时间过长，请稍后重试。"}),
+    "error": ("处理出错，任务结束",
+              {"reasoning": "系统处理出错", "answer": "抱歉，系统遇到错误，请稍后重试。"}),
+    "retries_exhausted": ("所有重试都失败，任务结束",
+                          {"reasoning": "系统多次重试失败", "answer": "抱歉，系统遇到错误，请稍后重试。"}),
+}
+
+
+def _failure_prediction(kind: str) -> Prediction:
+    """
+    创建选择finish工具的兜底预测
+    
+    预测结果会被推理循环修改并写入轨迹，每次返回新的实例，只共享固定的文本
+    
+    参数:
+        kind: _FAILURE_PREDICTIONS中的类型
         
-        # 重新调用预测
-        logger.info(f"尝试重新预测 (第{attempt}次尝试)")
-        return react_predictor(
-            **input_args,
-            trajectory=self._format_trajectory(retry_trajectory),
-            lm=lm
-        )
+    返回:
+        预测结果
+    """
+    thought, tool_args = _FAILURE_PREDICTIONS[kind]
+    return Prediction(next_thought=thought, next_tool_name="finish", next_tool_args=dict(tool_args))
+
+
+def _copy_prediction(result: Prediction) -> Prediction:
+    """
+    复制预测结果及其轨迹字典，存入响应缓存和从缓存返回时使用，调用方修改结果不会影响缓存
+    
+    参数:
+        result: 预测结果
+        
+    返回:
+        新的预测结果
+    """
+    copied = Prediction(result)
+    if isinstance(copied.get("trajectory"), dict):
+        copied["trajectory"] = dict(copied["trajectory"])
+    return copied
+
+
+def _observation_key(tool: Tool, args: Dict[str, Any]) -> Optional[Any]:
+    """观察结果缓存的键，参数中包含不可哈希的值时返回None"""
+    try:
+        key = (tool.name, frozenset(args.items()))
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _estimate_tokens(value: Any) -> int:
+    """
+    粗略估算文本的token数：ASCII字符约4个一个token，中文等非ASCII字符约1个字一个token
+    
+    参数:
+        value: 轨迹中的值，非字符串时按str()计算
+        
+    返回:
+        估算的token数
+    """
+    text = value if isinstance(value, str) else str(value)
+    # UTF-8下ASCII字符占1字节，常见的中日韩字符占3字节，据此推算非ASCII字符数
+    non_ascii = (len(text.encode("utf-8")) - len(text)) // 2
+    return (len(text) - non_ascii) // 4 + non_ascii
+
+
+@lru_cache(maxsize=32)
+def _trajectory_header(keys: Tuple[str, ...]) -> str:
+    """
+    轨迹文本的首行，列出所有常规字段名
+    
+    同一轮内的重试（截断后重试、工具名称无效时带错误反馈重新预测）字段名不变，直接复用
+    
+    参数:
+        keys: 轨迹中常规字段名（不含错误反馈）
+        
+    返回:
+        形如"thought_0, tool_name_0 -> x"的字符串
+    """
+    return f"{', '.join(keys)} -> x"
+
+
+# 轨迹中每一步包含的字段，键为"{字段}_{步骤序号}"
+_STEP_FIELDS = ("thought", "tool_name", "tool_args", "observation")
+
+
+def _step_of(key: str) -> Optional[int]:
+    """轨迹键所属的步骤序号，如thought_3返回3，summary等非步骤键返回None"""
+    prefix, _, suffix = key.rpartition("_")
+    return int(suffix) if prefix and suffix.isdigit() else None
+
+
+def _describe_tool(idx: int, tool: Tool) -> str:
+    """
+    生成指令中单个工具的描述
+    
+    参数:
+        idx: 工具序号（从0开始）
+        tool: 工具实例
+        
+    返回:
+        工具描述字符串
+    """
+    return _render_tool_desc(idx, tool.name, tool.desc, tool.schema_json)
+
+
+@lru_cache(maxsize=512)
+def _render_tool_desc(idx: int, name: str, desc: Optional[str], schema_json: str) -> str:
+    """按工具的名称、描述和参数结构缓存描述字符串，重复创建使用相同工具的智能体时直接复用"""
+    desc = (f"，其描述为 <desc>{desc}</desc>。" if desc else "。").replace("\n", "  ")
+    desc += f" 它接受JSON格式的参数 {schema_json}。"
+    return react_prompts["tool_desc_format"].format(idx=idx + 1, name=name, desc=desc)
+
+
+def _parse_tool_calls(value: Any) -> Optional[List[Any]]:
+    """
+    解析规划结果中的tool_calls字段
+    
+    参数:
+        value: 模型输出的tool_calls，可能是列表、JSON字符串或{"calls": [...]}
+        
+    返回:
+        工具调用列表，无法解析时返回None
+    """
+    if isinstance(value, str):
+        start, end = value.find("["), value.rfind("]")
+        if start == -1 or end < start:
+            return None
+        try:
+            value = _json.loads(value[start:end + 1])
+        except _json.JSONDecodeError:
+            return None
+    if isinstance(value, dict):
+        value = value.get("calls")
+    return value if isinstance(value, list) else None
+
+
+def _prompt_cache_key(instructions: str) -> str:
+    """
+    根据固定的指令前缀（含工具描述）生成提示缓存键
+    
+    参数:
+        instructions: ReAct签名的指令
+        
+    返回:
+        缓存键字符串
+    """
+    return "minireact-" + hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:32]
 
 
 def _fmt_exc(err: BaseException, *, limit: int = 5) -> str:
@@ -518,6 +1312,20 @@ def _fmt_exc(err: BaseException, *, limit: int = 5) -> str:
     返回:
         格式化后的异常字符串
     """
-    import traceback
+    return "\n" + "".join(traceback.format_exception(type(err), err, err.__traceback__, limit=limit)).strip()
+
+
+def _fmt_exc_short(err: BaseException) -> str:
+    """
+    返回异常的单行表示，不遍历堆栈
     
-    return "\n" + "".join(traceback.format_exception(type(err), err, err.__traceback__, limit=limit)).strip()
\ No newline at end of file
+    工具执行错误和可重试的错误每轮都可能发生，这里只需要异常类型和消息，
+    完整的堆栈（需要逐帧读取源码行）留给最终失败时的日志
+    
+    参数:
+        err: 异常对象
+        
+    返回:
+        "异常类型: 消息"形式的字符串
+    """
+    return f"{type(err).__name__}: {err}"
\ No newline at end of file
@@ -1,7 +1,9 @@
 """
 签名模块，用于定义任务的输入和输出规范
 """
-from typing import Any, Dict, Optional, Union, Type
+import hashlib
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple, Union, Type
 
 
 class Field:
@@ -34,6 +36,70 @@ class OutputField(Field):
     pass
 
 
+class CompiledPrompt:
+    """
+    预编译的提示模板
+    
+    签名的指令和输入字段名在多次调用间保持不变，预先拼好指令头部和各字段的标签，
+    每次调用只需填入输入值。
+    """
+    
+    def __init__(self, instructions: Optional[str], input_names: Tuple[str, ...]):
+        """
+        初始化提示模板
+        
+        参数:
+            instructions: 任务指令描述
+            input_names: 输入字段名
+        """
+        self.header = instructions or ""
+        self.input_names = input_names
+        self.labels = {name: f"{name}: " for name in input_names}
+    
+    def render(self, inputs: Dict[str, Any], format_value: Callable[[Any], Any] = str) -> str:
+        """
+        填入输入值，生成用户消息内容
+        
+        参数:
+            inputs: 输入参数，按其自身顺序输出；不在签名中的字段同样输出
+            format_value: 输入值的格式化函数
+            
+        返回:
+            用户消息内容
+        """
+        labels = self.labels
+        parts = [self.header] if self.header else []
+        for name, value in inputs.items():
+            label = labels.get(name) or f"{name}: "
+            parts.append(f"{label}{format_value(value)}")
+        return "\n".join(parts)
+
+
+@lru_cache(maxsize=256)
+def _compile(instructions: Optional[str], input_names: Tuple[str, ...]) -> CompiledPrompt:
+    """按指令和输入字段名缓存预编译的提示模板"""
+    return CompiledPrompt(instructions, input_names)
+
+
+@lru_cache(maxsize=256)
+def _digest(canonical: Tuple[Any, ...]) -> str:
+    """计算签名规范形式的稳定摘要"""
+    return hashlib.blake2b(repr(canonical).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _field_spec(name: str, field: Field) -> Tuple[str, Optional[str], Optional[str]]:
+    """字段的规范形式：(字段名, 描述, 类型名)"""
+    type_ = field.type
+    if type_ is None:
+        type_name = None
+    elif isinstance(type_, type):
+        type_name = type_.__qualname__
+    else:
+        # Literal[...]、Dict[str, Any]等泛型的__qualname__不含参数，用repr区分
+        type_name = repr(type_)
+    return (name, field.desc, type_name)
+
+
 class Signature:
     """
     签名类，用于定义任务的输入、输出和指令
@@ -99,6 +165,42 @@ class Signature:
             self.input_fields[name] = InputField(type_=type_)
         
         return self
+    
+    def compile(self) -> CompiledPrompt:
+        """
+        获取该签名的预编译提示模板
+        
+        模板按指令和输入字段名缓存，签名被修改（如append或修改指令）后会得到新的模板。
+        
+        返回:
+            CompiledPrompt实例
+        """
+        return _compile(self.instructions, tuple(self.input_fields))
+    
+    def canonical(self) -> Tuple[Any, ...]:
+        """
+        获取签名的规范形式
+        
+        由各字段的(字段名, 描述, 类型名)和指令组成，字段保持声明顺序（顺序会影响提示内容）。
+        内容相同的签名即使由不同的字段实例构造，规范形式也相同。
+        
+        返回:
+            可哈希的元组
+        """
+        return (
+            tuple(_field_spec(name, field) for name, field in self.input_fields.items()),
+            tuple(_field_spec(name, field) for name, field in self.output_fields.items()),
+            self.instructions,
+        )
+    
+    @property
+    def cache_key(self) -> str:
+        """
+        签名的稳定缓存键（十六进制字符串），跨进程一致，可用于响应缓存、提示前缀缓存等
+        
+        签名可被修改，因此每次访问都根据当前内容计算；摘要本身按规范形式缓存。
+        """
+        return _digest(self.canonical())
 
 
 def ensure_signature(signature: Union[Signature, Dict, Any]) -> Signature:
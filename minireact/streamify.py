@@ -2,7 +2,7 @@
 流式返回模块，为ReAct框架提供流式输出功能
 """
 import asyncio
-from sqlite3 import connect
+import copy
 from typing import Any, AsyncGenerator, Dict, List, Optional, Type, Union, Callable, Awaitable
 import inspect
 from pathlib import Path
@@ -12,6 +12,7 @@ from loguru import logger
 # 导入React核心类
 from .react import ReAct
 from .predict import Prediction
+from . import _json
 
 
 class StreamResponse:
@@ -116,20 +117,27 @@ async def _asyncify(func: Callable, *args, **kwargs) -> Any:
     if inspect.iscoroutinefunction(func):
         return await func(*args, **kwargs)
     else:
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
+        return await asyncio.to_thread(func, *args, **kwargs)
 
 
-def streamify(react_instance: ReAct) -> Callable[..., AsyncGenerator]:
+def streamify(react_instance: ReAct, early_tool_dispatch: bool = False) -> Callable[..., AsyncGenerator]:
     """
     将ReAct实例转换为支持流式返回的函数
     
     参数:
         react_instance: ReAct实例
+        early_tool_dispatch: 是否以流式方式接收每一步的模型输出，在工具参数完整后立即调用工具，
+                             不再等待模型生成剩余内容
         
     返回:
         一个函数，接收与原函数相同的参数，但返回一个异步生成器
     """
+    # 使用react预测模块的副本，避免影响ReAct实例本身的调用方式
+    react_predictor = react_instance.react
+    if early_tool_dispatch:
+        react_predictor = copy.copy(react_instance.react)
+        react_predictor.stop_after_tool_args = True
+    
     async def stream_wrapper(**kwargs) -> AsyncGenerator:
         """
         包装ReAct的forward方法，将其转换为一个异步生成器
@@ -169,6 +177,10 @@ def streamify(react_instance: ReAct) -> Callable[..., AsyncGenerator]:
                     
                     # 创建轨迹字典，用于存储推理过程
                     trajectory = {}
+                    # 本次运行中可缓存工具的观察结果
+                    observation_cache = {}
+                    # 本次运行中轨迹各条目的渲染结果
+                    rendered_steps = {}
                     
                     # 获取最大迭代次数，可在调用时覆盖默认值
                     max_iters = forward_kwargs.pop("max_iters", react_instance.max_iters)
@@ -177,26 +189,30 @@ def streamify(react_instance: ReAct) -> Callable[..., AsyncGenerator]:
                     # 迭代执行推理-行动-观察循环
                     for idx in range(max_iters):
                         try:
-                            logger.debug(f"第{idx}轮开始，调用_call_with_potential_trajectory_truncation")
-                            logger.debug(f"传递的lm: {lm.model_name if lm else '无'} @ {lm.api_base if lm else '无'}")
+                            # 日志参数交给loguru延迟格式化，未输出的日志不做字符串拼接
+                            logger.debug("第{}轮开始，调用_call_with_potential_trajectory_truncation", idx)
                             
+                            # 轨迹超出token预算时先总结较早的步骤
+                            trajectory = await _asyncify(react_instance._compress_trajectory, trajectory, lm, rendered_steps)
                             # 调用react预测模块进行下一步预测
-                            pred = react_instance._call_with_potential_trajectory_truncation(
-                                react_instance.react, trajectory, lm=lm, **forward_kwargs
+                            # LLM调用在线程池中执行，不阻塞事件循环，多个流可以同时进行
+                            pred = await _asyncify(
+                                react_instance._call_with_potential_trajectory_truncation,
+                                react_predictor, trajectory, lm=lm, rendered_steps=rendered_steps, **forward_kwargs
                             )
                             
-                            logger.debug(f"_call_with_potential_trajectory_truncation成功完成")
-                            logger.debug(f"pred类型: {type(pred)}")
-                            logger.debug(f"pred属性: {dir(pred)}")
-                            
                             # 检查pred是否有错误
                             if hasattr(pred, 'next_thought') and "qwen2.5:7b" in str(pred.next_thought):
                                 logger.error(f"发现qwen2.5:7b错误在next_thought中: {pred.next_thought}")
                             
                             # 添加调试信息
-                            logger.debug(f"思考: {pred.next_thought}")
-                            logger.debug(f"选择工具: {pred.next_tool_name}")
-                            logger.debug(f"工具参数: {pred.next_tool_args}")
+                            logger.debug("思考: {} | 选择工具: {} | 工具参数: {}",
+                                         pred.next_thought, pred.next_tool_name, pred.next_tool_args)
+                            
+                            # 原样重复上一步说明智能体在原地打转，直接提取结果
+                            if react_instance._is_repeated_step(trajectory, idx, pred):
+                                logger.info("智能体重复了上一步的思考和工具调用，提前结束推理循环")
+                                break
                             
                             # 流式返回思考过程
                             yield ThoughtResponse(pred.next_thought, idx)
@@ -212,7 +228,9 @@ def streamify(react_instance: ReAct) -> Callable[..., AsyncGenerator]:
                             try:
                                 # 调用选定的工具并记录结果
                                 tool = react_instance.tools[pred.next_tool_name]
-                                trajectory[f"observation_{idx}"] = tool(**pred.next_tool_args)
+                                trajectory[f"observation_{idx}"] = await _asyncify(
+                                    react_instance._invoke_tool, tool, pred.next_tool_args, observation_cache
+                                )
                             except Exception as err:
                                 # 记录工具执行错误
                                 trajectory[f"observation_{idx}"] = f"执行错误 {pred.next_tool_name}: {err}"
@@ -268,8 +286,9 @@ def streamify(react_instance: ReAct) -> Callable[..., AsyncGenerator]:
                             return  # 使用不带值的return终止生成器
                         
                         # 否则，调用extract模块提取结果
-                        extract = react_instance._call_with_potential_trajectory_truncation(
-                            react_instance.extract, trajectory, lm=lm, **forward_kwargs
+                        extract = await _asyncify(
+                            react_instance._call_with_potential_trajectory_truncation,
+                            react_instance.extract, trajectory, lm=lm, rendered_steps=rendered_steps, **forward_kwargs
                         )
                         # 合并提取的结果和已有的结果
                         for field_name in react_instance.signature.output_fields:
@@ -326,17 +345,17 @@ async def streaming_response(streamer: AsyncGenerator) -> AsyncGenerator:
     async for value in streamer:
         if isinstance(value, Prediction):
             data = {"prediction": {k: v for k, v in value.items() if k != "trajectory"}}
-            yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+            yield f"data: {_json.dumps(data)}\n\n"
         elif isinstance(value, StreamResponse):
             data = {"chunk": str(value)}
-            yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+            yield f"data: {_json.dumps(data)}\n\n"
         elif isinstance(value, str) and value.startswith("data:"):
             # 已经是兼容OpenAI格式的数据，直接返回
             yield value
         else:
             # 未知数据类型，转换为字符串
             data = {"chunk": str(value)}
-            yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+            yield f"data: {_json.dumps(data)}\n\n"
     
     # 添加完成标记
     yield "data: [DONE]\n\n" 
\ No newline at end of file
@@ -1,8 +1,48 @@
 """
 工具类模块，用于封装智能体可调用的函数或方法
 """
+import asyncio
 import inspect
-from typing import Any, Callable, Dict, Optional, get_type_hints
+import json
+import weakref
+from typing import Any, Callable, Dict, Optional, Tuple, get_type_hints
+
+
+# 按函数缓存参数定义及其序列化结果。同一函数被多次包装为Tool（如重复创建ReAct实例）时，
+# 不再重复解析函数签名和类型提示
+_schema_cache: "weakref.WeakKeyDictionary[Callable, Tuple[Dict[str, Any], str]]" = weakref.WeakKeyDictionary()
+
+
+def _type_name(arg_type: Any) -> str:
+    """类型的简短名称，如str、int、List[Dict[str, Any]]"""
+    if isinstance(arg_type, type):
+        return arg_type.__name__
+    return str(arg_type).replace("typing.", "")
+
+
+def _dump_schema(args: Dict[str, Any]) -> str:
+    """
+    将参数定义序列化为JSON字符串
+    
+    参数顺序与函数签名一致，类型以名称表示，结果在多次运行间逐字节相同，
+    便于服务端复用提示前缀缓存
+    
+    参数:
+        args: 参数定义字典
+        
+    返回:
+        JSON字符串
+    """
+    schema = {}
+    for name, spec in args.items():
+        if isinstance(spec, dict):
+            item = {"type": _type_name(spec.get("type", Any))}
+            if "default" in spec:
+                item["default"] = spec["default"]
+        else:
+            item = {"type": _type_name(spec)}
+        schema[name] = item
+    return json.dumps(schema, ensure_ascii=False, default=repr)
 
 
 class Tool:
@@ -19,6 +59,7 @@ class Tool:
         name: Optional[str] = None,
         desc: Optional[str] = None,
         args: Optional[Dict[str, Any]] = None,
+        cache: bool = False,
     ):
         """
         初始化工具
@@ -28,16 +69,71 @@ class Tool:
             name: 工具名称，默认使用函数名
             desc: 工具描述，默认使用函数的文档字符串
             args: 工具参数定义，默认从函数签名提取
+            cache: 工具是否为纯函数（相同参数总是返回相同结果）。为True时，
+                   同一次ReAct运行中相同参数的调用直接复用之前的观察结果
         """
         self.func = func
+        self.cache = cache
         self.name = name or getattr(func, "__name__", "未命名工具")
         self.desc = desc or inspect.getdoc(func) or "无描述"
         
-        # 如果没有提供参数定义，则从函数签名中提取
+        # 如果没有提供参数定义，则从函数签名中提取，同一函数的结果会被缓存
         if args is None:
-            self.args = self._extract_args_from_func(func)
+            try:
+                cached = _schema_cache.get(func)
+            except TypeError:  # 无法建立弱引用的可调用对象不缓存
+                cached = None
+            if cached is None:
+                extracted = self._extract_args_from_func(func)
+                cached = (extracted, _dump_schema(extracted))
+                try:
+                    _schema_cache[func] = cached
+                except TypeError:
+                    pass
+            self.args, self.schema_json = cached
         else:
             self.args = args
+            self.schema_json = _dump_schema(args)
+        
+        # 以下信息在每次调用时都会用到，初始化时计算一次
+        # 没有默认值的参数为必需参数
+        self.required_args = frozenset(
+            name for name, spec in self.args.items()
+            if not (isinstance(spec, dict) and "default" in spec)
+        )
+        self.is_async = inspect.iscoroutinefunction(func)
+        # 数值类型参数的转换函数，LLM给出的数字可能是字符串形式
+        self._coercers = {}
+        for name, spec in self.args.items():
+            arg_type = spec.get("type") if isinstance(spec, dict) else None
+            if arg_type in (int, float):
+                self._coercers[name] = arg_type
+    
+    def coerce_args(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        按参数类型转换参数值，目前只处理int和float参数，无法转换的值保持不变
+        
+        参数:
+            kwargs: 工具参数
+            
+        返回:
+            转换后的参数字典
+        """
+        if not self._coercers:
+            return kwargs
+        coerced = dict(kwargs)
+        for name, convert in self._coercers.items():
+            value = coerced.get(name)
+            if isinstance(value, str):
+                try:
+                    coerced[name] = convert(value.strip())
+                except ValueError:
+                    if convert is int:
+                        try:
+                            coerced[name] = float(value.strip())
+                        except ValueError:
+                            pass
+        return coerced
     
     def __call__(self, **kwargs: Any) -> Any:
         """
@@ -49,7 +145,22 @@ class Tool:
         返回:
             工具函数的返回值
         """
-        return self.func(**kwargs)
+        return self.func(**self.coerce_args(kwargs))
+    
+    async def acall(self, **kwargs: Any) -> Any:
+        """
+        异步调用工具函数，同步函数在线程池中执行
+        
+        参数:
+            **kwargs: 传递给工具函数的参数
+            
+        返回:
+            工具函数的返回值
+        """
+        kwargs = self.coerce_args(kwargs)
+        if self.is_async:
+            return await self.func(**kwargs)
+        return await asyncio.to_thread(self.func, **kwargs)
     
     def _extract_args_from_func(self, func: Callable) -> Dict[str, Any]:
         """
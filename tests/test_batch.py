@@ -0,0 +1,58 @@
+"""
+批量调用的测试：同步批量调用结束后不遗留异步HTTP客户端
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import minireact as mr
+from minireact import lm as lm_module
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    """兼容OpenAI协议的最小聊天接口，总是返回固定的回答"""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        out = json.dumps({
+            "model": body["model"],
+            "choices": [{"message": {"content": "answer: 42"}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+
+@pytest.fixture
+def local_lm():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield mr.LM(model_name="test", api_key="test", api_base=f"http://127.0.0.1:{server.server_port}/v1/")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_predict_batch_releases_async_clients(local_lm):
+    signature = mr.Signature(
+        {"question": mr.InputField(desc="问题")},
+        {"answer": mr.OutputField(desc="回答")},
+        "回答问题"
+    )
+    predict = mr.Predict(signature, use_cache=False)
+    
+    for round_ in range(3):
+        results = predict.batch([{"question": f"q{round_}-{i}", "lm": local_lm} for i in range(3)])
+        assert [result.answer for result in results] == ["42"] * 3
+        assert len(lm_module._shared_async_clients) == 0
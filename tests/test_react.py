@@ -0,0 +1,33 @@
+"""
+ReAct的测试：parallel工具中单个调用出错不影响其他调用
+"""
+import minireact as mr
+
+
+def slow(x: int) -> int:
+    """返回x的两倍"""
+    return x * 2
+
+
+def test_parallel_isolates_invalid_calls():
+    signature = mr.Signature(
+        {"question": mr.InputField(desc="问题")},
+        {"answer": mr.OutputField(desc="回答")},
+        "回答问题"
+    )
+    agent = mr.ReAct(signature, tools=[slow], enable_parallel_tool_execution=True)
+    
+    results = agent._run_parallel([
+        {"tool_name": "slow", "tool_args": {"x": 1}},
+        {"tool_name": "slow", "tool_args": [1]},
+        {"tool_name": "slow", "tool_args": '{"x": 3}'},
+        {"tool_name": ["slow"], "tool_args": {"x": 4}},
+        "slow",
+        {"tool_name": "slow", "tool_args": {"x": 2}},
+    ])
+    
+    observations = [result["observation"] for result in results]
+    assert observations[0] == 2
+    assert observations[-1] == 4
+    assert all(isinstance(observation, str) and observation.startswith("执行错误")
+               for observation in observations[1:-1])